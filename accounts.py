@@ -0,0 +1,158 @@
+import asyncio
+import collections
+from ledger import claim_reward, ensure_user
+
+MAX_ACCOUNTS = 10000
+
+
+class Account:
+    __slots__ = ('user_id', 'balance', 'pending', 'daily_claimed_at', 'hourly_claimed_at')
+
+    def __init__(self, user_id, balance, daily_claimed_at, hourly_claimed_at):
+        self.user_id = user_id
+        self.balance = balance
+        self.pending = 0
+        self.daily_claimed_at = daily_claimed_at
+        self.hourly_claimed_at = hourly_claimed_at
+
+
+class AccountCache:
+    # Write-back cache of hot accounts. Balances change in memory and only the accumulated
+    # delta per account is written back, so a burst of bets costs one UPDATE per user per
+    # flush. Idle accounts are evicted least recently used first, but only once clean.
+
+    def __init__(self, ledger, max_accounts=MAX_ACCOUNTS):
+        self.ledger = ledger
+        self.max_accounts = max_accounts
+        self.hits = 0
+        self.misses = 0
+        self.flushes = 0
+        self._accounts = collections.OrderedDict()
+        self._dirty = set()
+        self._flushing = set()
+        self._loading = {}
+        self._flushers = []
+        self._flush_lock = asyncio.Lock()
+        self._flush_task = None
+
+    def __len__(self):
+        return len(self._accounts)
+
+    @property
+    def dirty_count(self):
+        return len(self._dirty)
+
+    async def get(self, user_id):
+        account = self._accounts.get(user_id)
+        if account is not None:
+            self.hits += 1
+            self._accounts.move_to_end(user_id)
+            return account
+
+        self.misses += 1
+        loading = self._loading.get(user_id)
+        if loading is None:
+            loading = asyncio.ensure_future(self._load(user_id))
+            self._loading[user_id] = loading
+        return await asyncio.shield(loading)
+
+    async def _load(self, user_id):
+        try:
+            row = await self.ledger.run(_load_account, user_id)
+        finally:
+            del self._loading[user_id]
+        account = Account(user_id, row['balance'], row['daily_claimed_at'], row['hourly_claimed_at'])
+        self._accounts[user_id] = account
+        self._evict()
+        return account
+
+    def adjust(self, account, delta):
+        account.balance += delta
+        account.pending += delta
+        self._dirty.add(account.user_id)
+
+    async def claim(self, account, column, chips, now, cutoff):
+        # Claims are written straight through as one conditional upsert rather than cached,
+        # so two claims racing each other cannot both pass. The cached claim time only
+        # short-circuits the obvious refusals.
+        if getattr(account, column) > cutoff:
+            return False
+        claimed, claimed_at = await self.ledger.run(claim_reward, column, account.user_id, chips, now, cutoff)
+        setattr(account, column, claimed_at)
+        if claimed:
+            # The database already has the chips, so they are not added to pending.
+            account.balance += chips
+        return claimed
+
+    def invalidate(self):
+        for user_id in [user_id for user_id in self._accounts if user_id not in self._dirty]:
+            del self._accounts[user_id]
+
+    def add_flusher(self, collect):
+        # collect() returns ([(sql, rows), ...], restore); the statements are written in the
+        # same transaction as the balance deltas and restore() is called if that fails.
+        self._flushers.append(collect)
+
+    async def flush(self):
+        async with self._flush_lock:
+            batches = [self._collect()] + [collect() for collect in self._flushers]
+            statements = [statement for batch, _ in batches for statement in batch if statement[1]]
+            if not statements:
+                return 0
+            try:
+                written = await self.ledger.run(_write_statements, statements)
+            except Exception:
+                for _, restore in batches:
+                    restore()
+                raise
+            finally:
+                self._flushing.clear()
+            self.flushes += 1
+            self._evict()
+            return written
+
+    def _collect(self):
+        balance_rows = []
+        collected = []
+        self._flushing.update(self._dirty)
+        for user_id in self._dirty:
+            account = self._accounts[user_id]
+            collected.append((account, account.pending))
+            if account.pending:
+                balance_rows.append((account.pending, user_id))
+            account.pending = 0
+        self._dirty.clear()
+
+        def restore():
+            for account, pending in collected:
+                account.pending += pending
+                self._dirty.add(account.user_id)
+
+        statements = [
+            ('UPDATE user_balance SET balance = balance + ? WHERE user_id = ?', balance_rows),
+        ]
+        return statements, restore
+
+    def _evict(self):
+        if len(self._accounts) <= self.max_accounts:
+            return
+        # The most recently used account is never evicted: its caller is about to use it.
+        for user_id in list(self._accounts)[:-1]:
+            if len(self._accounts) <= self.max_accounts:
+                return
+            if user_id not in self._dirty and user_id not in self._flushing:
+                del self._accounts[user_id]
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.ensure_future(self.flush())
+
+
+def _load_account(conn, user_id):
+    ensure_user(conn, user_id)
+    return conn.execute('SELECT balance, daily_claimed_at, hourly_claimed_at FROM user_balance WHERE user_id = ?', (user_id,)).fetchone()
+
+
+def _write_statements(conn, statements):
+    written = 0
+    for sql, rows in statements:
+        written += conn.executemany(sql, rows).rowcount
+    return written
@@ -0,0 +1,204 @@
+import argparse
+import json
+import math
+import sys
+import time
+from fractions import Fraction
+from statistics import NormalDist
+
+import numpy as np
+
+import minesweeper
+import payouts
+
+# Offline return-to-player audit for dice, coinflip, rps and minesweeper. Rounds are
+# simulated in NumPy chunks through the same payout functions the bot uses, so a change
+# to the rules shows up here before it shows up in the economy.
+
+CHUNK = 5_000_000
+GAMES = ['dice', 'coinflip', 'rps', 'minesweeper']
+Z_95 = 1.959964
+DEFAULT_SEED = 2024
+# Chance that a run with no overpaying configuration fails anyway, shared across all the
+# configurations audited.
+FALSE_ALARM_RATE = 0.01
+
+
+class Tally:
+    def __init__(self):
+        self.rounds = 0
+        self.total = 0.0
+        self.total_sq = 0.0
+
+    def add(self, returns):
+        # returns: payout / stake per round.
+        self.rounds += returns.size
+        self.total += float(returns.sum())
+        self.total_sq += float(np.square(returns).sum())
+
+    def report(self):
+        rtp = self.total / self.rounds
+        variance = max(self.total_sq / self.rounds - rtp * rtp, 0.0)
+        half_width = Z_95 * math.sqrt(variance / self.rounds)
+        return {
+            'rounds': self.rounds,
+            'rtp': rtp,
+            'variance': variance,
+            'std_error': math.sqrt(variance / self.rounds),
+            'ci_low': rtp - half_width,
+            'ci_high': rtp + half_width,
+        }
+
+
+def _chunks(rounds, chunk=CHUNK):
+    while rounds > 0:
+        size = min(rounds, chunk)
+        yield size
+        rounds -= size
+
+
+def audit_dice(rng, rounds, bet_amount, choice, number):
+    multiplier = payouts.dice_multiplier(choice, number)
+    tally = Tally()
+    for size in _chunks(rounds):
+        rolls = np.round(rng.uniform(payouts.DICE_ROLL_MIN, payouts.DICE_ROLL_MAX, size), 2)
+        won = payouts.dice_won(choice, number, rolls)
+        tally.add(payouts.dice_payout(bet_amount, multiplier, won) / bet_amount)
+    return tally.report()
+
+
+def audit_coinflip(rng, rounds, bet_amount):
+    tally = Tally()
+    for size in _chunks(rounds):
+        won = rng.integers(0, 2, size) == rng.integers(0, 2, size)
+        tally.add(payouts.coinflip_payout(bet_amount, won) / bet_amount)
+    return tally.report()
+
+
+def audit_rps(rng, rounds, bet_amount):
+    tally = Tally()
+    for size in _chunks(rounds):
+        outcome = payouts.rps_outcome(rng.integers(0, 3, size), rng.integers(0, 3, size))
+        tally.add(payouts.rps_payout(bet_amount, outcome) / bet_amount)
+    return tally.report()
+
+
+def audit_minesweeper(rng, rounds, bet_amount, mines):
+    # Picks are blind, so the player's cells can be 0, 1, 2, ... and only the number of
+    # picks before cashing out matters; that is drawn per round to cover every cash out.
+    # A mine sits on each of the `mines` cells with the smallest random key. The big
+    # multipliers are rare enough to make the estimate noisy, so the report also has the
+    # exact return of the best cash out point, worked out from the same odds.
+    safe = minesweeper.CELLS - mines
+    cash_out = [minesweeper.payout(bet_amount, mines, picks) for picks in range(safe + 1)]
+    exact_rtp = max(Fraction(cash_out[picks] * math.comb(safe, picks), bet_amount * math.comb(minesweeper.CELLS, picks))
+                    for picks in range(1, safe + 1))
+    cash_out = np.array(cash_out)
+    tally = Tally()
+    for size in _chunks(rounds, CHUNK // minesweeper.CELLS):
+        keys = rng.random((size, minesweeper.CELLS))
+        nearest = np.partition(keys, mines - 1, axis=1)[:, mines - 1:mines]
+        first_mine = np.argmax(keys <= nearest, axis=1)
+        picks = rng.integers(1, safe + 1, size)
+        tally.add((picks <= first_mine) * cash_out[picks] / bet_amount)
+    report = tally.report()
+    report['exact_rtp'] = float(exact_rtp)
+    return report
+
+
+def dice_targets(step):
+    targets = []
+    for choice, (low, high) in (('over', payouts.DICE_OVER_RANGE), ('under', payouts.DICE_UNDER_RANGE)):
+        number = math.ceil(low / step) * step
+        while number <= high:
+            targets.append((choice, round(number, 2)))
+            number += step
+    return targets
+
+
+def run(rounds, bet_amount, seed, dice_step, games):
+    rng = np.random.default_rng(seed)
+    results = []
+
+    def timed(game, fn, *args, **labels):
+        started = time.perf_counter()
+        report = fn(rng, rounds, bet_amount, *args)
+        elapsed = time.perf_counter() - started
+        report.update(game=game, seconds=elapsed, rounds_per_second=rounds / elapsed, **labels)
+        results.append(report)
+
+    if 'dice' in games:
+        for choice, number in dice_targets(dice_step):
+            timed('dice', audit_dice, choice, number, choice=choice, number=number)
+    if 'coinflip' in games:
+        timed('coinflip', audit_coinflip)
+    if 'rps' in games:
+        timed('rps', audit_rps)
+    if 'minesweeper' in games:
+        for mines in range(1, minesweeper.CELLS):
+            timed('minesweeper', audit_minesweeper, mines, mines=mines)
+    return results
+
+
+def gate_z(configurations):
+    # One-sided, Bonferroni corrected: with a dozen or more configurations a plain 95%
+    # bound would put a fair game over 100% every few runs.
+    return NormalDist().inv_cdf(1 - FALSE_ALARM_RATE / configurations)
+
+
+def pays_out_too_much(report, z):
+    # Where the exact return is known it must stay under 100%; simulated ones fail only
+    # when they are over it by more than chance explains, since the even-money games sit
+    # right at 100%.
+    overpays = report['rtp'] - z * report['std_error'] > 1.0
+    if 'exact_rtp' in report:
+        return report['exact_rtp'] >= 1.0 or overpays
+    return overpays
+
+
+def format_report(report):
+    label = report['game']
+    if label == 'dice':
+        label = f"dice {report['choice']} {report['number']:g}"
+    elif label == 'minesweeper':
+        label = f"minesweeper {report['mines']}"
+    line = (f"{label:<18} RTP {report['rtp'] * 100:8.4f}%  "
+            f"95% CI [{report['ci_low'] * 100:8.4f}%, {report['ci_high'] * 100:8.4f}%]  "
+            f"var {report['variance']:9.4f}  {report['rounds_per_second'] / 1e6:6.1f}M rounds/s")
+    if 'exact_rtp' in report:
+        line += f"  best cash out {report['exact_rtp'] * 100:8.4f}%"
+    return line
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Simulate dice, coinflip, rps and minesweeper payouts and report return to player')
+    parser.add_argument('--rounds', type=int, default=10_000_000, help='Rounds per game and dice target')
+    parser.add_argument('--bet', type=int, default=payouts.MIN_BET,
+                        help='Stake per round; payouts are rounded down to whole chips')
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED,
+                        help='Random seed; fixed by default so a build passes or fails the same way every run')
+    parser.add_argument('--dice-step', type=float, default=10.0, help='Spacing of the dice targets to audit')
+    parser.add_argument('--games', nargs='+', default=GAMES, choices=GAMES)
+    parser.add_argument('--json', metavar='PATH', help='Also write the results to PATH, e.g. to compare runs')
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    results = run(args.rounds, args.bet, args.seed, args.dice_step, args.games)
+    for report in results:
+        print(format_report(report))
+
+    z = gate_z(len(results))
+    inflating = [report for report in results if pays_out_too_much(report, z)]
+    print(f"{len(results)} audits, {sum(r['rounds'] for r in results):,} rounds in {time.perf_counter() - started:.1f}s, "
+          f"failing above RTP - {z:.2f} standard errors")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'rounds': args.rounds, 'bet': args.bet, 'seed': args.seed, 'results': results}, f, indent=2)
+    if inflating:
+        print(f"{len(inflating)} configuration(s) pay out more than they take in")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,188 @@
+import asyncio
+import json
+
+from accounts import AccountCache
+from cooldowns import DayClock
+from economy import EconomyStats
+from escrow import Escrow
+from fairness import Seeds, seed_hash
+from ledger import Ledger
+from transactions import DAY, TransactionLog
+
+FLUSH_INTERVAL = 2.0
+
+# Everything a shard may ask of the bank. Results are plain ints, strings, lists and
+# dicts with string keys so they survive the trip through the ledger service unchanged.
+REMOTE_METHODS = (
+    'balance', 'claim', 'reserve', 'settle', 'play_rounds', 'rank', 'leaderboard', 'history',
+    'game_totals', 'economy_report', 'guild_timezones', 'set_guild_timezone', 'stats',
+    'fair_draw', 'fair_seed', 'rotate_seed', 'fair_bet',
+)
+
+
+class Bank:
+    # All chip movements go through here. The bot uses it in-process when it runs as a
+    # single process; with shards, the ledger service owns the only Bank and every shard
+    # talks to it through a BankClient with the same methods.
+
+    def __init__(self, path, timezone):
+        self.ledger = Ledger(path)
+        self.accounts = AccountCache(self.ledger)
+        self.transactions = TransactionLog(self.accounts)
+        self.escrow = Escrow(self.accounts, self.transactions)
+        self.seeds = Seeds(self.accounts)
+        self.economy = EconomyStats(self.accounts, DayClock(timezone))
+        self.transactions.add_observer(self.economy.record)
+        self._flush_task = None
+
+    async def start(self):
+        self.ledger.start()
+        await self.economy.load()
+        refunded = await self.escrow.refund_pending()
+        await self.seeds.start()
+        self._flush_task = asyncio.ensure_future(self._flush_loop())
+        return refunded
+
+    async def close(self):
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        await self.accounts.flush()
+        self.ledger.close()
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(FLUSH_INTERVAL)
+            try:
+                await self.accounts.flush()
+            except Exception as e:
+                # The deltas were restored and go out with the next flush.
+                print(f'Ledger flush failed: {e!r}')
+
+    async def balance(self, user_id):
+        account = await self.accounts.get(user_id)
+        return account.balance
+
+    async def claim(self, user_id, game, chips, now, cutoff):
+        # Returns [claimed, claimed_at]; game is 'daily' or 'hourly'.
+        account = await self.accounts.get(user_id)
+        column = f'{game}_claimed_at'
+        claimed = await self.accounts.claim(account, column, chips, now, cutoff)
+        if claimed:
+            self.economy.record(user_id, game, 0, chips)
+        return [claimed, getattr(account, column)]
+
+    async def reserve(self, user_id, amount, game):
+        # The reservation id, or None if the user cannot cover the bet.
+        reservation = await self.escrow.reserve(user_id, amount, game)
+        return None if reservation is None else reservation.id
+
+    async def settle(self, reservation_id, payout):
+        # The user's new balance, or None if the bet was already settled.
+        reservation = self.escrow.get(reservation_id)
+        if reservation is None:
+            return None
+        return await self.escrow.settle(reservation, payout)
+
+    async def play_rounds(self, user_id, stake, payouts, game, game_id):
+        # [rounds played, new balance]; see Escrow.play_rounds.
+        played = await self.escrow.play_rounds(user_id, stake, payouts, game, game_id)
+        return [played, await self.balance(user_id)]
+
+    async def fair_draw(self, user_id, game, params, game_id=None):
+        # [game id, server seed, client seed, nonce] for one bet; see fairness.FairRandom.
+        # params is whatever fairness.replay needs besides the stream to redo the outcome.
+        if game_id is None:
+            game_id = self.escrow.new_game_id()
+        seed, nonce = await self.seeds.draw(user_id, game_id, game, params)
+        return [game_id, seed.server_seed, seed.client_seed, nonce]
+
+    async def fair_seed(self, user_id):
+        # [server seed hash, client seed, next nonce] of the seed in use.
+        seed = await self.seeds.get(user_id)
+        return [seed.hash, seed.client_seed, seed.nonce]
+
+    async def rotate_seed(self, user_id, client_seed=None):
+        # The retired seed as [server seed, hash, client seed, bets made], then the new one's
+        # [hash, client seed]. None while the user has a game open: games like minesweeper
+        # draw as they go, so revealing the seed mid-game would give away the rest of it.
+        if self.escrow.has_open(user_id):
+            return None
+        old = await self.seeds.rotate(user_id, client_seed)
+        new = await self.seeds.get(user_id)
+        return [[old.server_seed, old.hash, old.client_seed, old.nonce], [new.hash, new.client_seed]]
+
+    async def fair_bet(self, game_id):
+        # Everything .verify needs about one game, or None. The server seed is only
+        # included once the seed has been rotated out.
+        row = await self.seeds.bet(game_id)
+        if row is None:
+            return None
+        game, params, nonce, user_id, server_seed, client_seed, revealed_at, rounds, stake, payout = row
+        return {
+            'game': game,
+            'params': json.loads(params),
+            'nonce': nonce,
+            'user_id': user_id,
+            'server_seed': server_seed if revealed_at is not None else None,
+            'server_seed_hash': seed_hash(server_seed),
+            'client_seed': client_seed,
+            'rounds': rounds,
+            'stake': stake,
+            'payout': payout,
+        }
+
+    async def rank(self, user_id):
+        await self.accounts.flush()
+        account = await self.accounts.get(user_id)
+        richer = await self.ledger.fetchone('SELECT COUNT(*) FROM user_balance WHERE balance > ?', (account.balance,))
+        return [richer[0] + 1, account.balance]
+
+    async def leaderboard(self, offset, limit):
+        await self.accounts.flush()
+        rows = await self.ledger.fetchall('SELECT user_id, balance FROM user_balance ORDER BY balance DESC LIMIT ? OFFSET ?',
+                                          (limit, offset))
+        return [tuple(row) for row in rows]
+
+    async def history(self, user_id, limit):
+        rows = await self.transactions.history(user_id, limit)
+        return [(row.game, row.stake, row.payout, row.created_at, row.game_id) for row in rows]
+
+    async def game_totals(self, game, start, end):
+        return list(await self.transactions.game_totals(game, start, end))
+
+    async def economy_report(self, days):
+        rows, active = await self.economy.days(days)
+        return {
+            'supply': self.economy.supply,
+            'active_today': self.economy.active_today,
+            'days': [(day, game, totals.rounds, totals.handle, totals.payout) for day, game, totals in rows],
+            'active': sorted(active.items()),
+        }
+
+    async def guild_timezones(self):
+        return [tuple(row) for row in await self.ledger.fetchall('SELECT guild_id, timezone FROM guild_settings')]
+
+    async def set_guild_timezone(self, guild_id, timezone):
+        await self.ledger.execute('INSERT INTO guild_settings (guild_id, timezone) VALUES (?, ?) '
+                                  'ON CONFLICT (guild_id) DO UPDATE SET timezone = excluded.timezone', (guild_id, timezone))
+
+    async def stats(self):
+        return {
+            'ledger_operations': self.ledger.operations,
+            'ledger_commits': self.ledger.commits,
+            'ledger_reads': self.ledger.reads,
+            'cached_accounts': len(self.accounts),
+            'cache_hits': self.accounts.hits,
+            'cache_misses': self.accounts.misses,
+            'open_bets': self.escrow.open_count,
+            'cached_seeds': len(self.seeds),
+        }
+
+    async def end_of_day(self, day_start, retention_days):
+        # Housekeeping after local midnight; only the process that owns the Bank runs it.
+        compacted = 0
+        if retention_days > 0:
+            compacted = await self.transactions.compact(day_start - retention_days * DAY)
+        await self.economy.prune()
+        return compacted
@@ -0,0 +1,361 @@
+import argparse
+import asyncio
+import collections
+import contextvars
+import itertools
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import discord
+from discord.ext.commands import Context
+from discord.ext.commands.view import StringView
+
+import wordle_words
+
+# Load test for the bot's commands without Discord. discordBot is imported as a module,
+# its setup_hook runs against a scratch database and simulated users type commands and
+# press buttons through stand-ins for Context, Message and Interaction. Every message
+# send, edit, interaction response and user lookup goes to FakeREST, which counts it
+# and can add latency. Results are written per commit so runs can be compared.
+
+COMMANDS = ('dice', 'bj', 'cf', 'rps', 'ms', 'wordle', 'daily', 'lb')
+STARTING_BALANCE = 1_000_000
+RESULTS_DIR = 'benchmarks'
+
+# Which simulated command an awaited ledger or REST call belongs to. Tasks copy it when
+# they are created, so work a command starts (an outbox drain, say) is charged to it.
+current = contextvars.ContextVar('bench_command', default='background')
+
+
+class Tally:
+    def __init__(self):
+        self.calls = collections.Counter()
+        self.routes = collections.Counter()
+
+    def add(self, route):
+        self.calls[current.get()] += 1
+        self.routes[route] += 1
+
+
+class FakeREST:
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.tally = Tally()
+
+    async def call(self, route):
+        self.tally.add(route)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    async def get_user(self, user_id):
+        await self.call('get_user')
+        return {'id': str(user_id), 'username': f'user{user_id}', 'discriminator': '0', 'avatar': None, 'global_name': None}
+
+
+class FakeUser:
+    def __init__(self, user_id, bot=False):
+        self.id = user_id
+        self.name = f'user{user_id}'
+        self.display_name = self.name
+        self.mention = f'<@{user_id}>'
+        self.bot = bot
+
+
+class FakeMessage:
+    _ids = itertools.count(1)
+
+    def __init__(self, rest, channel, author, content='', kwargs=None):
+        self.id = next(self._ids)
+        self.rest = rest
+        self.channel = channel
+        self.author = author
+        self.content = content
+        self.guild = None
+        self.attachments = []
+        self.view = (kwargs or {}).get('view')
+        self._state = None
+
+    async def edit(self, **kwargs):
+        await self.rest.call('edit_message')
+        if 'view' in kwargs:
+            self.view = kwargs['view']
+        return self
+
+
+class FakeChannel:
+    def __init__(self, rest, channel_id, bot_user):
+        self.id = channel_id
+        self.rest = rest
+        self.bot_user = bot_user
+        self.last = None
+
+    async def send(self, content=None, **kwargs):
+        await self.rest.call('send_message')
+        self.last = FakeMessage(self.rest, self, self.bot_user, content, kwargs)
+        return self.last
+
+
+class FakeResponse:
+    def __init__(self, rest, message):
+        self.rest = rest
+        self.message = message
+
+    async def edit_message(self, **kwargs):
+        await self.rest.call('interaction_response')
+        if 'view' in kwargs:
+            self.message.view = kwargs['view']
+
+    async def defer(self, **kwargs):
+        await self.rest.call('interaction_response')
+
+    async def send_message(self, content=None, **kwargs):
+        await self.rest.call('interaction_response')
+
+
+class FakeInteraction:
+    def __init__(self, rest, user, message, action):
+        self.type = discord.InteractionType.component
+        self.user = user
+        self.message = message
+        self.data = {'custom_id': f'casino:{action}'}
+        self.response = FakeResponse(rest, message)
+
+
+class BenchContext(Context):
+    # ctx.send goes straight to the fake channel instead of discord.py's HTTP client.
+    async def send(self, content=None, **kwargs):
+        return await self.channel.send(content, **kwargs)
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+class Bench:
+    def __init__(self, casino, users, rounds, think, rest_latency, mix, seed):
+        self.casino = casino
+        self.users = users
+        self.rounds = rounds
+        self.think = think
+        self.mix = mix
+        self.rng = random.Random(seed)
+        self.rest = FakeREST(rest_latency)
+        self.db = Tally()
+        self.latencies = collections.defaultdict(list)
+        self.words = sorted(wordle_words.VALID_GUESSES)
+        self.bot_user = FakeUser(0, bot=True)
+
+    def instrument(self):
+        bot = self.casino.bot
+        bot.http.get_user = self.rest.get_user
+        ledger = self.casino.bank.ledger
+        submit, read = ledger.submit, ledger.read
+
+        def counted_submit(fn, *args):
+            self.db.add(fn.__name__)
+            return submit(fn, *args)
+
+        def counted_read(fn, *args):
+            self.db.add(fn.__name__)
+            return read(fn, *args)
+
+        ledger.submit = counted_submit
+        ledger.read = counted_read
+
+    async def seed(self):
+        rows = [(user_id, STARTING_BALANCE) for user_id in range(1, self.users + 1)]
+        await self.casino.bank.ledger.executemany('INSERT INTO user_balance (user_id, balance) VALUES (?, ?)', rows)
+
+    async def invoke(self, user, channel, content):
+        message = FakeMessage(self.rest, channel, user, content)
+        view = StringView(content)
+        ctx = BenchContext(prefix='.', view=view, bot=self.casino.bot, message=message)
+        view.skip_string('.')
+        ctx.invoked_with = view.get_word()
+        ctx.command = self.casino.bot.all_commands.get(ctx.invoked_with)
+        await self.casino.remember_author(message)
+        await self.casino.bot.invoke(ctx)
+
+    async def press(self, user, label, action, name=None):
+        message = user.channel.last
+        if message is None or message.view is None:
+            return
+        started = time.perf_counter()
+        await self.casino.dispatcher.dispatch(FakeInteraction(self.rest, user, message, action))
+        self.latencies[f'{label} {name or action}'].append(time.perf_counter() - started)
+
+    def command_line(self, command, rng):
+        bet = rng.randint(10, 500)
+        if command == 'dice':
+            return f".dice {rng.choice(('over', 'under'))} {rng.randint(5, 95)} {bet}"
+        if command == 'wordle':
+            return f'.wordle {rng.choice(self.words)}'
+        if command in ('bj', 'cf', 'rps', 'ms'):
+            return f'.{command} {bet}'
+        return f'.{command}'
+
+    async def user(self, user_id):
+        rng = random.Random(self.rng.random())
+        user = FakeUser(user_id)
+        user.channel = FakeChannel(self.rest, 10_000 + user_id, self.bot_user)
+        await asyncio.sleep(rng.uniform(0, self.think))
+        for _ in range(self.rounds):
+            command = rng.choice(self.mix)
+            token = current.set(command)
+            try:
+                started = time.perf_counter()
+                await self.invoke(user, user.channel, self.command_line(command, rng))
+                self.latencies[command].append(time.perf_counter() - started)
+                if command == 'rps':
+                    await self.press(user, command, str(rng.randrange(3)))
+                elif command == 'cf':
+                    await self.press(user, command, str(rng.randrange(2)))
+                elif command == 'bj':
+                    if rng.random() < 0.3:
+                        await self.press(user, command, 'hit')
+                    await self.press(user, command, 'stand')
+                elif command == 'ms':
+                    for cell in rng.sample(range(20), rng.randint(1, 4)):
+                        await self.press(user, command, str(cell), 'reveal')
+                    await self.press(user, command, 'cashout')
+            finally:
+                current.reset(token)
+            if self.think:
+                await asyncio.sleep(rng.expovariate(1 / self.think))
+
+    async def run(self):
+        bot = self.casino.bot
+        async with bot:
+            await self.casino.setup_hook()
+            # Commands are invoked directly rather than through on_message, so nothing
+            # would load the game extensions on demand.
+            await self.casino.load_extensions()
+            self.instrument()
+            await self.seed()
+            started = time.perf_counter()
+            await asyncio.gather(*(self.user(user_id) for user_id in range(1, self.users + 1)))
+            elapsed = time.perf_counter() - started
+            await self.casino.bank.close()
+        return self.report(elapsed)
+
+    def report(self, elapsed):
+        commands = sum(len(self.latencies[command]) for command in self.mix)
+        results = {}
+        for label, values in sorted(self.latencies.items()):
+            count = len(values)
+            entry = {
+                'count': count,
+                'p50_ms': percentile(values, 0.5) * 1000,
+                'p99_ms': percentile(values, 0.99) * 1000,
+                'mean_ms': sum(values) / count * 1000,
+            }
+            if label in self.mix:
+                entry['db_per_command'] = self.db.calls[label] / count
+                entry['rest_per_command'] = self.rest.tally.calls[label] / count
+            results[label] = entry
+        lag = self.casino.metrics.series('event_loop_lag_seconds').get(())
+        return {
+            'seconds': elapsed,
+            'commands': commands,
+            'commands_per_second': commands / elapsed,
+            'loop_lag_p99_ms': lag.quantile(0.99) * 1000 if lag is not None else None,
+            'background_db': self.db.calls['background'],
+            'db_routes': dict(self.db.routes),
+            'rest_routes': dict(self.rest.tally.routes),
+            'results': results,
+        }
+
+
+def git_revision():
+    repo = os.path.dirname(os.path.abspath(__file__))
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=repo,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=repo,
+                                    capture_output=True, text=True, check=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown', False
+    return commit, dirty
+
+
+def format_report(report):
+    lines = [f"{'':<14}{'count':>7}{'p50 ms':>10}{'p99 ms':>10}{'db/cmd':>8}{'rest/cmd':>10}"]
+    for label, entry in report['results'].items():
+        db = f"{entry['db_per_command']:.2f}" if 'db_per_command' in entry else ''
+        rest = f"{entry['rest_per_command']:.2f}" if 'rest_per_command' in entry else ''
+        lines.append(f"{label:<14}{entry['count']:>7}{entry['p50_ms']:>10.2f}{entry['p99_ms']:>10.2f}{db:>8}{rest:>10}")
+    lag = report['loop_lag_p99_ms']
+    lines.append(f"{report['commands']} commands in {report['seconds']:.1f}s ({report['commands_per_second']:.0f}/s), "
+                 f"event loop lag p99 {lag:.1f}ms, {report['background_db']} background ledger calls"
+                 if lag is not None else
+                 f"{report['commands']} commands in {report['seconds']:.1f}s ({report['commands_per_second']:.0f}/s)")
+    return '\n'.join(lines)
+
+
+def format_comparison(before, after):
+    lines = [f"compared with {before['commit']}: {_change(before['commands_per_second'], after['commands_per_second'])} commands/s"]
+    for label, entry in after['results'].items():
+        old = before['results'].get(label)
+        if old is None:
+            continue
+        lines.append(f"{label:<14} p50 {_change(old['p50_ms'], entry['p50_ms'])}, p99 {_change(old['p99_ms'], entry['p99_ms'])}")
+    return '\n'.join(lines)
+
+
+def _change(old, new):
+    if not old:
+        return f'{new:.2f}'
+    return f'{new:.2f} ({(new - old) / old * 100:+.1f}%)'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Drive the bot commands with simulated users and fake Discord REST')
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--rounds', type=int, default=5, help='Commands per user')
+    parser.add_argument('--think', type=float, default=1.0, help='Mean seconds a user waits between commands')
+    parser.add_argument('--rest-latency', type=float, default=0.0, help='Seconds added to every fake REST call')
+    parser.add_argument('--commands', nargs='+', default=list(COMMANDS), choices=COMMANDS)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', default=RESULTS_DIR, help='Directory for <commit>.json results')
+    parser.add_argument('--no-save', action='store_true')
+    parser.add_argument('--compare', metavar='COMMIT_OR_PATH', help='Earlier results to compare against')
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as scratch:
+        os.environ['DATABASE_PATH'] = os.path.join(scratch, 'bench.db')
+        os.environ['METRICS_PORT'] = '0'
+        os.environ.pop('LEDGER_ADDRESS', None)
+        import discordBot
+        random.seed(args.seed)
+        bench = Bench(discordBot, args.users, args.rounds, args.think, args.rest_latency, args.commands, args.seed)
+        report = asyncio.run(bench.run())
+
+    commit, dirty = git_revision()
+    report.update(commit=commit, dirty=dirty, created_at=int(time.time()),
+                  config={'users': args.users, 'rounds': args.rounds, 'think': args.think,
+                          'rest_latency': args.rest_latency, 'commands': args.commands, 'seed': args.seed})
+    print(format_report(report))
+
+    if args.compare:
+        path = args.compare if os.path.exists(args.compare) else os.path.join(args.out, f'{args.compare}.json')
+        with open(path, encoding='utf-8') as f:
+            print(format_comparison(json.load(f), report))
+    if not args.no_save:
+        os.makedirs(args.out, exist_ok=True)
+        name = f"{commit}{'-dirty' if dirty else ''}.json"
+        with open(os.path.join(args.out, name), 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f'Saved {os.path.join(args.out, name)}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
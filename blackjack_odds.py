@@ -0,0 +1,217 @@
+import argparse
+import functools
+import sys
+
+from cards import DECKS
+
+# Ranks are indexed 0-9 for A, 2-9 and ten-valued cards; a shoe composition is a tuple
+# of how many of each are left. Everything below is exact for the table rules the bot
+# plays: a two-card 21 is paid at once, the player may only hit or stand, a player bust
+# loses immediately and a dealer 21 is not checked for a natural.
+#
+# By default the dealer's odds are worked out from the shoe as it stood after the initial
+# deal, ignoring the cards the player hits afterwards; this is the usual
+# "composition-dependent" approximation and keeps a 6-deck solve to a couple of seconds.
+# Rules(exact=True) removes every card the player draws as well, at a much higher cost.
+RANK_VALUES = (1, 2, 3, 4, 5, 6, 7, 8, 9, 10)
+RANK_LABELS = ('A', '2', '3', '4', '5', '6', '7', '8', '9', 'T')
+DEALER_TOTALS = (17, 18, 19, 20, 21)
+BUST = len(DEALER_TOTALS)
+
+
+class Rules:
+    def __init__(self, decks=DECKS, blackjack_payout=1.5, dealer_hits_soft_17=False, exact=False):
+        self.decks = decks
+        self.blackjack_payout = blackjack_payout
+        self.dealer_hits_soft_17 = dealer_hits_soft_17
+        self.exact = exact
+
+    def key(self):
+        return self.decks, self.blackjack_payout, self.dealer_hits_soft_17, self.exact
+
+    def describe(self):
+        soft_17 = "hits" if self.dealer_hits_soft_17 else "stands on"
+        return f"{self.decks} deck(s), blackjack pays {self.blackjack_payout:g}x, dealer {soft_17} soft 17"
+
+
+class Solution:
+    def __init__(self, rules, ev, strategy, states):
+        self.rules = rules
+        self.ev = ev
+        self.strategy = strategy
+        self.states = states
+
+    @property
+    def house_edge(self):
+        return -self.ev
+
+
+def full_shoe(decks):
+    return (4 * decks,) * 9 + (16 * decks,)
+
+
+def hand_total(total, aces):
+    # Best total for a hand whose aces were all counted as 1, and whether it is soft.
+    if aces and total + 10 <= 21:
+        return total + 10, True
+    return total, False
+
+
+class Solver:
+    def __init__(self, rules):
+        self.rules = rules
+        self.states = 0
+        self._dealer = {}
+        self._player = {}
+
+    def dealer_outcomes(self, counts, total, aces):
+        key = (counts, total, aces)
+        cached = self._dealer.get(key)
+        if cached is not None:
+            return cached
+        self.states += 1
+
+        best, soft = hand_total(total, aces)
+        if best > 21:
+            outcome = [0.0] * (BUST + 1)
+            outcome[BUST] = 1.0
+        elif best >= 17 and not (best == 17 and soft and self.rules.dealer_hits_soft_17):
+            outcome = [0.0] * (BUST + 1)
+            outcome[best - 17] = 1.0
+        else:
+            outcome = [0.0] * (BUST + 1)
+            remaining = sum(counts)
+            for rank, count in enumerate(counts):
+                if not count:
+                    continue
+                p = count / remaining
+                drawn = counts[:rank] + (count - 1,) + counts[rank + 1:]
+                sub = self.dealer_outcomes(drawn, total + RANK_VALUES[rank], aces + (rank == 0))
+                for i in range(BUST + 1):
+                    outcome[i] += p * sub[i]
+
+        outcome = tuple(outcome)
+        self._dealer[key] = outcome
+        return outcome
+
+    def stand_ev(self, counts, player_total, upcard):
+        outcome = self.dealer_outcomes(counts, RANK_VALUES[upcard], int(upcard == 0))
+        ev = outcome[BUST]
+        for i, dealer_total in enumerate(DEALER_TOTALS):
+            if player_total > dealer_total:
+                ev += outcome[i]
+            elif player_total < dealer_total:
+                ev -= outcome[i]
+        return ev
+
+    def player_ev(self, counts, total, aces, upcard, dealer_counts):
+        # Returns (best ev, stand ev, hit ev) for a hand drawn from a shoe that now holds
+        # `counts`. The dealer's hole card is still in the shoe: it is exchangeable with
+        # the player's hits, so the dealer can be treated as drawing it last.
+        key = (counts, total, aces, upcard, dealer_counts)
+        cached = self._player.get(key)
+        if cached is not None:
+            return cached
+
+        best, _ = hand_total(total, aces)
+        stand = self.stand_ev(counts if dealer_counts is None else dealer_counts, best, upcard)
+        hit = 0.0
+        remaining = sum(counts)
+        for rank, count in enumerate(counts):
+            if not count:
+                continue
+            p = count / remaining
+            new_total = total + RANK_VALUES[rank]
+            if new_total > 21:
+                hit -= p
+                continue
+            drawn = counts[:rank] + (count - 1,) + counts[rank + 1:]
+            hit += p * self.player_ev(drawn, new_total, aces + (rank == 0), upcard, dealer_counts)[0]
+
+        result = (max(stand, hit), stand, hit)
+        self._player[key] = result
+        return result
+
+    def solve(self):
+        counts = full_shoe(self.rules.decks)
+        strategy = {}
+        ev = 0.0
+        total_cards = sum(counts)
+        for first, first_count in enumerate(counts):
+            p_first = first_count / total_cards
+            after_first = counts[:first] + (first_count - 1,) + counts[first + 1:]
+            for second, second_count in enumerate(after_first):
+                if not second_count:
+                    continue
+                p_second = p_first * second_count / (total_cards - 1)
+                after_second = after_first[:second] + (second_count - 1,) + after_first[second + 1:]
+                total = RANK_VALUES[first] + RANK_VALUES[second]
+                aces = int(first == 0) + int(second == 0)
+                natural = hand_total(total, aces)[0] == 21
+                for upcard, up_count in enumerate(after_second):
+                    if not up_count:
+                        continue
+                    p = p_second * up_count / (total_cards - 2)
+                    if natural:
+                        ev += p * self.rules.blackjack_payout
+                        continue
+                    shoe = after_second[:upcard] + (up_count - 1,) + after_second[upcard + 1:]
+                    best, stand, hit = self.player_ev(shoe, total, aces, upcard, None if self.rules.exact else shoe)
+                    ev += p * best
+                    _record(strategy, total, aces, upcard, p, stand, hit)
+        return Solution(self.rules, ev, strategy, self.states)
+
+
+def _record(strategy, total, aces, upcard, p, stand, hit):
+    best, soft = hand_total(total, aces)
+    key = ('soft' if soft else 'hard', best, upcard)
+    weight, stand_sum, hit_sum = strategy.get(key, (0.0, 0.0, 0.0))
+    strategy[key] = (weight + p, stand_sum + p * stand, hit_sum + p * hit)
+
+
+@functools.lru_cache(maxsize=16)
+def _solve(key):
+    return Solver(Rules(*key)).solve()
+
+
+def solve(rules):
+    return _solve(rules.key())
+
+
+def strategy_table(solution):
+    upcards = list(range(1, 10)) + [0]
+    lines = ["      " + " ".join(f"{RANK_LABELS[u]:>2}" for u in upcards)]
+    for kind, totals in (('hard', range(4, 21)), ('soft', range(13, 21))):
+        for total in totals:
+            cells = []
+            for upcard in upcards:
+                entry = solution.strategy.get((kind, total, upcard))
+                if entry is None:
+                    cells.append(" -")
+                    continue
+                _, stand, hit = entry
+                cells.append(" S" if stand >= hit else " H")
+            label = f"{'S' if kind == 'soft' else 'H'}{total}"
+            lines.append(f"{label:>5} " + " ".join(cells))
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Exact house edge and hit/stand strategy for the bot's blackjack rules")
+    parser.add_argument('--decks', type=int, default=DECKS)
+    parser.add_argument('--payout', type=float, default=1.5, help='Blackjack (natural) payout multiplier')
+    parser.add_argument('--hit-soft-17', action='store_true', help='Dealer hits soft 17')
+    parser.add_argument('--exact', action='store_true', help='Remove the player\'s hit cards from the dealer\'s shoe too (slow)')
+    parser.add_argument('--strategy', action='store_true', help='Print the hit/stand table')
+    args = parser.parse_args(argv)
+
+    rules = Rules(args.decks, args.payout, args.hit_soft_17, args.exact)
+    solution = solve(rules)
+    print(rules.describe())
+    print(f"Player EV: {solution.ev * 100:+.4f}%  House edge: {solution.house_edge * 100:.4f}%  ({solution.states} dealer states)")
+    if args.strategy:
+        print(strategy_table(solution))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
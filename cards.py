@@ -0,0 +1,64 @@
+import random
+
+# A card is a small int, rank * 4 + suit, so a shoe is just a bytearray and every
+# per-card lookup below is a tuple index.
+RANKS = ('A', '2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K')
+SUITS = ('❤️', '♠️', '♦️', '♣️')
+
+CARD_VALUES = tuple(11 if rank == 0 else min(rank + 1, 10) for rank in range(len(RANKS)) for _ in SUITS)
+CARD_NAMES = tuple(rank + suit for rank in RANKS for suit in SUITS)
+
+DECKS = 6
+
+
+def card_name(card):
+    return CARD_NAMES[card]
+
+
+def format_cards(cards):
+    return ', '.join(CARD_NAMES[card] for card in cards)
+
+
+def hand_value(cards):
+    value = 0
+    aces = 0
+
+    for card in cards:
+        card_value = CARD_VALUES[card]
+        value += card_value
+        if card_value == 11:
+            aces += 1
+
+    while aces > 0 and value > 21:
+        value -= 10
+        aces -= 1
+
+    return value
+
+
+def user_blackjack(cards):
+    return len(cards) == 2 and hand_value(cards) == 21
+
+
+class Shoe:
+    # The cards for one hand: a full shoe, shuffled lazily with one Fisher-Yates step per
+    # card drawn. Every hand gets its own, so concurrent hands never draw from or
+    # reshuffle each other's cards, and a hand costs a random number per card it uses
+    # rather than a whole shuffle.
+    __slots__ = ('cards', 'position', 'rng')
+
+    def __init__(self, decks=DECKS, rng=random):
+        self.cards = bytearray(range(len(CARD_NAMES))) * decks
+        self.position = 0
+        self.rng = rng
+
+    def __len__(self):
+        return len(self.cards) - self.position
+
+    def draw(self):
+        cards = self.cards
+        i = self.position
+        j = self.rng.randrange(i, len(cards))
+        cards[i], cards[j] = cards[j], cards[i]
+        self.position = i + 1
+        return cards[i]
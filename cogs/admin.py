@@ -0,0 +1,130 @@
+import io
+
+import discord
+from discord.ext import commands
+
+from gateway import memory_usage
+from ledger_service import BankClient
+from profiler import SamplingProfiler
+
+
+def timing_lines(series, limit=8):
+    rows = sorted(series.items(), key=lambda item: item[1].sum, reverse=True)[:limit]
+    return "\n".join(f"`{' '.join(labels) or '-'}` {histogram.count}x, p50 {histogram.quantile(0.5) * 1000:.1f}ms, "
+                     f"p99 {histogram.quantile(0.99) * 1000:.1f}ms, max {histogram.max * 1000:.1f}ms"
+                     for labels, histogram in rows) or "-"
+
+
+class Admin(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+        self.bank = bot.bank
+        self.outbox = bot.outbox
+        self.metrics = bot.metrics
+        # On the bot so a running profile survives reloading this extension.
+        if getattr(bot, 'profiler', None) is None:
+            bot.profiler = SamplingProfiler()
+        self.profiler = bot.profiler
+
+    def wordle_sessions(self):
+        sessions = getattr(self.bot, 'wordle_sessions', None)
+        return len(sessions) if sessions is not None else 0
+
+    @commands.group(name='perf', invoke_without_command=True, help='Show command, database and HTTP timings')
+    @commands.is_owner()
+    async def perf(self, ctx):
+        lag = self.metrics.series('event_loop_lag_seconds').get(())
+        errors = sum(self.metrics.counts('command_errors_total').values())
+
+        embed = discord.Embed(title="Performance", color=0x89CFF0)
+        embed.add_field(name="Commands (by total time)", value=timing_lines(self.metrics.series('command_seconds')), inline=False)
+        embed.add_field(name="Ledger", value=timing_lines(self.metrics.series('ledger_seconds')), inline=False)
+        embed.add_field(name="HTTP", value=timing_lines(self.metrics.series('http_request_seconds')), inline=False)
+        if lag is not None:
+            embed.add_field(name="Event Loop Lag", value=f"p99 {lag.quantile(0.99) * 1000:.1f}ms, max {lag.max * 1000:.1f}ms", inline=True)
+        embed.add_field(name="Command Errors", value=str(errors), inline=True)
+        embed.add_field(name="Open Games", value=f"{len(self.bot.dispatcher)} + {self.wordle_sessions()} wordle", inline=True)
+        embed.add_field(name="Profiler", value="running" if self.profiler.running else "off", inline=True)
+        await self.outbox.send(ctx, embed=embed)
+
+    @perf.command(name='profile', help='Switch the sampling profiler on or off')
+    @commands.is_owner()
+    async def perf_profile(self, ctx, state: str):
+        profiler = self.profiler
+        if state == 'on':
+            started = profiler.start()
+            await self.outbox.send(ctx, "Profiler started." if started else "Profiler is already running.")
+            return
+        if state != 'off':
+            await self.outbox.send(ctx, "Usage: `.perf profile [on/off]`")
+            return
+        if not profiler.stop():
+            await self.outbox.send(ctx, "Profiler is not running.")
+            return
+
+        leaves, inclusive = profiler.top()
+        samples = max(profiler.samples, 1)
+        embed = discord.Embed(title=f"Profile - {profiler.samples} samples", color=0x89CFF0)
+        embed.add_field(name="Self", value="\n".join(f"{count / samples * 100:.1f}% `{frame}`" for frame, count in leaves) or "-", inline=False)
+        embed.add_field(name="Total", value="\n".join(f"{count / samples * 100:.1f}% `{frame}`" for frame, count in inclusive) or "-", inline=False)
+        stacks = discord.File(io.BytesIO(profiler.folded().encode()), filename='profile.folded')
+        await self.outbox.send(ctx, embed=embed, file=stacks)
+
+    @commands.command(name='outbox', help='Show the outgoing message queue')
+    @commands.is_owner()
+    async def outbox_stats(self, ctx):
+        outbox = self.outbox
+        busiest = sorted(outbox.channel_depths().items(), key=lambda item: item[1], reverse=True)[:5]
+
+        embed = discord.Embed(title="Outbox", color=0x89CFF0)
+        embed.add_field(name="Queued", value=f"{outbox.depth} (max {outbox.max_depth})", inline=True)
+        embed.add_field(name="Sent / Edited", value=f"{outbox.sent} / {outbox.edited}", inline=True)
+        embed.add_field(name="Edits Merged", value=str(outbox.coalesced), inline=True)
+        embed.add_field(name="Rate Limit Wait", value=f"{outbox.wait_time:.1f}s ({outbox.rate_limited} refused)", inline=True)
+        if busiest:
+            embed.add_field(name="Busiest Channels", value="\n".join(f"<#{channel_id}>: {depth}" for channel_id, depth in busiest), inline=False)
+        await outbox.send(ctx, embed=embed)
+
+    @commands.command(name='locks', help='Show per-user lock contention')
+    @commands.is_owner()
+    async def lock_stats(self, ctx):
+        user_locks = self.bot.user_locks
+        contended = user_locks.contended / user_locks.acquisitions * 100 if user_locks.acquisitions else 0
+
+        embed = discord.Embed(title="User Locks", color=0x89CFF0)
+        embed.add_field(name="Live Locks", value=str(len(user_locks)), inline=True)
+        embed.add_field(name="Acquisitions", value=str(user_locks.acquisitions), inline=True)
+        embed.add_field(name="Contended", value=f"{user_locks.contended} ({contended:.1f}%)", inline=True)
+        embed.add_field(name="Time Waiting", value=f"{user_locks.wait_time:.2f}s (max {user_locks.max_wait * 1000:.0f}ms)", inline=True)
+        ledger = await self.bank.stats()
+        embed.add_field(name="Ledger", value=f"{ledger['ledger_operations']} writes in {ledger['ledger_commits']} commits, "
+                                             f"{ledger['ledger_reads']} reads", inline=False)
+        if isinstance(self.bank, BankClient):
+            embed.add_field(name="Ledger Service", value=f"{self.bank.requests} calls in {self.bank.frames} frames", inline=False)
+        await self.outbox.send(ctx, embed=embed)
+
+    @commands.command(name='memory', help='Show memory use and cache sizes')
+    @commands.is_owner()
+    async def memory(self, ctx):
+        bot = self.bot
+        current, peak = memory_usage()
+        members = sum(len(guild.members) for guild in bot.guilds)
+
+        embed = discord.Embed(title=f"Memory - {bot.gateway_profile} profile", color=0x89CFF0)
+        embed.add_field(name="Resident", value=f"{current / 2**20:.1f} MB" if current is not None else "-", inline=True)
+        embed.add_field(name="Peak", value=f"{peak / 2**20:.1f} MB", inline=True)
+        embed.add_field(name="Guilds", value=str(len(bot.guilds)), inline=True)
+        embed.add_field(name="Cached Users", value=str(len(bot.users)), inline=True)
+        embed.add_field(name="Cached Members", value=str(members), inline=True)
+        embed.add_field(name="Cached Messages", value=f"{len(bot.cached_messages)} / {bot.message_cache_size}", inline=True)
+        embed.add_field(name="Known Names", value=f"{len(bot.usernames)} / {bot.usernames.max_names}", inline=True)
+        embed.add_field(name="Open Games", value=str(len(bot.dispatcher)), inline=True)
+        embed.add_field(name="Wordle Sessions", value=str(self.wordle_sessions()), inline=True)
+        ledger = await self.bank.stats()
+        embed.add_field(name="Cached Accounts", value=str(ledger['cached_accounts']), inline=True)
+        embed.add_field(name="Cached Seeds", value=str(ledger['cached_seeds']), inline=True)
+        await self.outbox.send(ctx, embed=embed)
+
+
+async def setup(bot):
+    await bot.add_cog(Admin(bot))
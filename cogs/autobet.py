@@ -0,0 +1,152 @@
+import math
+import os
+
+import discord
+from discord.ext import commands
+
+import fairness
+from payouts import (COIN_FACES, DICE_OVER_RANGE, DICE_UNDER_RANGE, MIN_BET, coin_flip, coinflip_payout, dice_multiplier,
+                     dice_payout, dice_roll, dice_won)
+
+AUTOBET_MAX_ROUNDS = int(os.getenv("AUTOBET_MAX_ROUNDS", 1000))
+COIN_SIDES = {'heads': 0, 'h': 0, 'tails': 1, 't': 1}
+SPARKS = '▁▂▃▄▅▆▇█'
+SPARKLINE_WIDTH = 30
+USAGE = ("Usage: `.autobet dice [over/under] [number] [bet amount] x[rounds] [profit=N] [loss=N]`\n"
+         "or `.autobet cf [heads/tails] [bet amount] x[rounds] [profit=N] [loss=N]`")
+
+
+def stop_after(bet_amount, payouts, stop_profit, stop_loss):
+    # How many rounds run before a limit is hit, counting the round that hits it.
+    net = 0
+    for index, payout in enumerate(payouts):
+        net += payout - bet_amount
+        if (stop_profit and net >= stop_profit) or (stop_loss and net <= -stop_loss):
+            return index + 1
+    return len(payouts)
+
+
+def sparkline(values, width=SPARKLINE_WIDTH):
+    step = math.ceil(len(values) / width)
+    points = values[step - 1::step]
+    if len(values) % step:
+        points.append(values[-1])
+    low, high = min(points), max(points)
+    span = (high - low) or 1
+    return ''.join(SPARKS[(value - low) * (len(SPARKS) - 1) // span] for value in points)
+
+
+class Autobet(commands.Cog):
+    # Runs hundreds of dice or coinflip rounds as one command: the outcomes are drawn up
+    # front from one provably fair stream, cut at the stop limits, and the bank settles them in a single call with one
+    # balance change, so a long run costs about what one ordinary bet does.
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.bank = bot.bank
+        self.outbox = bot.outbox
+        self.user_locks = bot.user_locks
+
+    @commands.command(name='autobet', help='Play many rounds of dice or coinflip at once')
+    async def autobet(self, ctx, game: str = None, *args):
+        positional = [arg for arg in args if '=' not in arg]
+        options = dict(arg.lower().split('=', 1) for arg in args if '=' in arg)
+        if game is None or not positional or not positional[-1].lower().startswith('x'):
+            await self.outbox.send(ctx, USAGE)
+            return
+
+        try:
+            rounds = int(positional.pop()[1:])
+            bet_amount = int(positional.pop())
+            stop_profit = int(options.pop('profit', 0))
+            stop_loss = int(options.pop('loss', 0))
+        except (ValueError, IndexError):
+            await self.outbox.send(ctx, "Incorrect usage.\n" + USAGE)
+            return
+
+        if bet_amount < MIN_BET or stop_profit < 0 or stop_loss < 0 or options:
+            await self.outbox.send(ctx, f"Please enter a bet amount of at least {MIN_BET} and positive limits.\n" + USAGE)
+            return
+
+        if not 0 < rounds <= AUTOBET_MAX_ROUNDS:
+            await self.outbox.send(ctx, f"The number of rounds must be between 1 and {AUTOBET_MAX_ROUNDS}.")
+            return
+
+        game = game.lower()
+        if game == 'dice' and len(positional) == 2:
+            choice, number = positional[0].lower(), positional[1]
+            try:
+                number = float(number)
+            except ValueError:
+                await self.outbox.send(ctx, "Incorrect usage.\n" + USAGE)
+                return
+            if choice not in ['over', 'under']:
+                await self.outbox.send(ctx, "Invalid choice. Use 'over' or 'under'.\n" + USAGE)
+                return
+            multiplier = dice_multiplier(choice, number)
+            if multiplier is None:
+                low, high = DICE_OVER_RANGE if choice == 'over' else DICE_UNDER_RANGE
+                await self.outbox.send(ctx, "Invalid number range.\n"
+                                       f"{low} - {high} for {choice} rolls")
+                return
+            if dice_payout(bet_amount, multiplier, True) <= bet_amount:
+                await self.outbox.send(ctx, f"A win at {multiplier:.2f}x on {bet_amount} chips rounds down to nothing. "
+                                       "Raise the bet or pick a riskier number.")
+                return
+            title = f"Autobet - Dice {choice} {number}"
+            game = 'dice'
+
+            def play(rng):
+                return dice_payout(bet_amount, multiplier, dice_won(choice, number, dice_roll(rng)))
+        elif game in ('coinflip', 'cf') and len(positional) == 1 and positional[0].lower() in COIN_SIDES:
+            side = COIN_SIDES[positional[0].lower()]
+            title = f"Autobet - Heads or Tails {COIN_FACES[side]}"
+            game = 'coinflip'
+
+            def play(rng):
+                return coinflip_payout(bet_amount, coin_flip(rng) == side)
+        else:
+            await self.outbox.send(ctx, USAGE)
+            return
+
+        user_id = ctx.author.id
+        async with self.user_locks.hold(user_id):
+            game_id, rng = await fairness.draw(self.bank, user_id, game, [rounds])
+            payouts = [play(rng) for _ in range(rounds)]
+            limit = stop_after(bet_amount, payouts, stop_profit, stop_loss)
+            played, balance = await self.bank.play_rounds(user_id, bet_amount, payouts[:limit], game, game_id)
+
+        if not played:
+            await self.outbox.send(ctx, "You don't have enough chips to place that bet.")
+            return
+
+        running = []
+        net = 0
+        for payout in payouts[:played]:
+            net += payout - bet_amount
+            running.append(net)
+        wins = sum(payout > bet_amount for payout in payouts[:played])
+
+        if played < limit:
+            stopped = "Ran out of chips"
+        elif limit < rounds:
+            stopped = "Profit target reached" if net > 0 else "Loss limit reached"
+        else:
+            stopped = "All rounds played"
+
+        color = 0x00ff00 if net > 0 else 0xff0000 if net < 0 else 0xffff00
+        embed = discord.Embed(title=title, color=color)
+        embed.add_field(name="Rounds", value=f"{played}/{rounds}", inline=True)
+        embed.add_field(name="Wins", value=f"{wins} ({wins / played:.0%})", inline=True)
+        embed.add_field(name="Wagered", value=f"{bet_amount * played} chips", inline=True)
+        embed.add_field(name="Profit/Loss", value=f"{net:+d} chips", inline=True)
+        embed.add_field(name="Balance", value=f"{balance} chips", inline=True)
+        embed.add_field(name="Stopped", value=stopped, inline=True)
+        embed.add_field(name="Running P&L",
+                        value=f"`{sparkline(running)}`\nLow {min(running):+d}, high {max(running):+d}", inline=False)
+        embed.set_footer(text=f"Bet Amount: {bet_amount} chips per round | Game #{game_id}")
+        await self.outbox.send(ctx, embed=embed)
+
+
+async def setup(bot):
+    await bot.add_cog(Autobet(bot))
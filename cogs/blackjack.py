@@ -0,0 +1,186 @@
+import asyncio
+import os
+
+import discord
+from discord.ext import commands
+
+import blackjack_odds
+import fairness
+from cards import Shoe, card_name, format_cards, hand_value, user_blackjack
+from dispatcher import Session, controls
+from outbox import log_failure
+
+BLACKJACK_DECKS = int(os.getenv("BLACKJACK_DECKS", 6))
+BLACKJACK_PAYOUT = 1.5
+
+
+def blackjack_embed(player_cards, bot_cards, reveal_dealer, color=0xff9900):
+    embed = discord.Embed(title="Blackjack", color=color)
+    embed.add_field(name="Your cards", value=f"{format_cards(player_cards)}\nValue: {hand_value(player_cards)}", inline=False)
+    if reveal_dealer:
+        embed.add_field(name="Dealer's cards", value=f"{format_cards(bot_cards)}\nValue: {hand_value(bot_cards)}", inline=False)
+    else:
+        embed.add_field(name="Dealer's cards", value=f"{card_name(bot_cards[0])}, ?\nValue: {hand_value([bot_cards[0]])}", inline=False)
+    return embed
+
+
+class BlackjackSession(Session):
+    timeout = 60.0
+
+    def __init__(self, cog, user_id, reservation, bet_amount, shoe, player_cards, bot_cards):
+        super().__init__(user_id)
+        self.cog = cog
+        self.reservation = reservation
+        self.bet_amount = bet_amount
+        self.shoe = shoe
+        self.player_cards = player_cards
+        self.bot_cards = bot_cards
+
+    async def on_action(self, interaction, action):
+        if action == 'hit':
+            await self.hit(interaction)
+        elif action == 'stand':
+            await self.stand(interaction)
+
+    async def hit(self, interaction):
+        new_card = self.shoe.draw()
+        self.player_cards.append(new_card)
+
+        if hand_value(self.player_cards) > 21:
+            self.cog.dispatcher.close(self)
+            await self.cog.bank.settle(self.reservation, 0)
+            embed_bust = blackjack_embed(self.player_cards, self.bot_cards, True, 0xff0000)
+            embed_bust.add_field(name="Result", value=f"Bust! You drew a {card_name(new_card)}. You lose.", inline=False)
+            await interaction.response.edit_message(embed=embed_bust, view=None)
+            return
+
+        embed = blackjack_embed(self.player_cards, self.bot_cards, False)
+        embed.add_field(name="Result", value=f"You drew a {card_name(new_card)}", inline=False)
+        embed.set_footer(text=f"Bet Amount: {self.bet_amount} chips")
+        await interaction.response.edit_message(embed=embed)
+
+    async def stand(self, interaction):
+        # The dealer's hand is played out and the bet settled before any Discord call, so a
+        # failed edit can't leave the stake reserved; the dealer's turn is only animated after.
+        self.cog.dispatcher.close(self)
+        bot_cards = self.bot_cards
+        dealt = len(bot_cards)
+        while hand_value(bot_cards) < 17:
+            bot_cards.append(self.shoe.draw())
+
+        player_value = hand_value(self.player_cards)
+        dealer_value = hand_value(bot_cards)
+
+        if dealer_value > 21 or (player_value <= 21 and player_value > dealer_value):
+            await self.cog.bank.settle(self.reservation, self.bet_amount * 2)
+            embed_result = blackjack_embed(self.player_cards, bot_cards, True, 0x00ff00)
+            embed_result.add_field(name="Result", value=f"You win! +{self.bet_amount} chips.", inline=False)
+        elif player_value == dealer_value:
+            await self.cog.bank.settle(self.reservation, self.bet_amount)
+            embed_result = blackjack_embed(self.player_cards, bot_cards, True, 0xffff00)
+            embed_result.add_field(name="Result", value="It's a tie!", inline=False)
+        else:
+            await self.cog.bank.settle(self.reservation, 0)
+            embed_result = blackjack_embed(self.player_cards, bot_cards, True, 0xff0000)
+            embed_result.add_field(name="Result", value=f"You lose. -{self.bet_amount} chips.", inline=False)
+
+        await interaction.response.edit_message(embed=blackjack_embed(self.player_cards, bot_cards[:dealt], True), view=None)
+        for shown in range(dealt, len(bot_cards)):
+            await asyncio.sleep(1)
+            embed_dealer_hit = blackjack_embed(self.player_cards, bot_cards[:shown], True)
+            embed_dealer_hit.add_field(name="Dealer's Turn", value=f"Dealer hits. Dealer's cards: {format_cards(bot_cards[:shown])}, ?", inline=False)
+            # Not awaited, so frames still queued when the next one comes are merged into it.
+            self.cog.outbox.edit(self.message, embed=embed_dealer_hit).add_done_callback(log_failure)
+
+        await asyncio.sleep(1)
+        await self.cog.outbox.edit(self.message, embed=embed_result)
+
+    async def on_timeout(self):
+        await self.cog.bank.settle(self.reservation, 0)
+        await self.cog.outbox.edit(self.message, content="Took too long to decide. Game over.", view=None)
+
+
+BLACKJACK_BUTTONS = [
+    ('hit', "Hit", "✅", discord.ButtonStyle.success),
+    ('stand', "Stand", "❌", discord.ButtonStyle.danger),
+]
+
+
+class Blackjack(commands.Cog):
+    # Hands in progress live in the dispatcher and keep a reference to the cog that dealt
+    # them, so reloading this extension lets them finish on the old code.
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.bank = bot.bank
+        self.outbox = bot.outbox
+        self.dispatcher = bot.dispatcher
+        self.user_locks = bot.user_locks
+
+    @commands.command(name='blackjack', aliases=['bj'], help='Play a hand of blackjack vs the Bot')
+    async def blackjack(self, ctx, bet_amount=None):
+
+        if bet_amount is None:
+            await self.outbox.send(ctx, "Usage: `.bj [bet amount]`")
+            return
+
+        try:
+            bet_amount = int(bet_amount)
+        except ValueError:
+            await self.outbox.send(ctx, "Please enter a valid bet amount.\n"
+                                   "Usage: `.bj [bet amount]`")
+            return
+
+        if bet_amount <= 0:
+            await self.outbox.send(ctx, "Please enter a bet amount greater than 0.\n"
+                                   "Usage: `.bj [bet amount]`")
+            return
+
+        user_id = ctx.author.id
+        async with self.user_locks.hold(user_id):
+            reservation = await self.bank.reserve(user_id, bet_amount, 'blackjack')
+
+            if reservation is None:
+                await self.outbox.send(ctx, "You don't have enough chips to place that bet.")
+                return
+
+            try:
+                _, rng = await fairness.draw(self.bank, user_id, 'blackjack', [BLACKJACK_DECKS], reservation)
+                shoe = Shoe(BLACKJACK_DECKS, rng)
+                player_cards = [shoe.draw(), shoe.draw()]
+                bot_cards = [shoe.draw(), shoe.draw()]
+
+                if user_blackjack(player_cards):
+                    await self.bank.settle(reservation, bet_amount + int(bet_amount * BLACKJACK_PAYOUT))
+
+                    embed_blackjack = blackjack_embed(player_cards, bot_cards, True, 0x00ff00)
+                    embed_blackjack.add_field(name="Result", value=f"Blackjack! You win! +{int(bet_amount * BLACKJACK_PAYOUT)} chips.", inline=False)
+                    await self.outbox.send(ctx, embed=embed_blackjack)
+                    return
+
+                embed = blackjack_embed(player_cards, bot_cards, False)
+                embed.set_footer(text=f"Bet Amount: {bet_amount} chips")
+
+                message = await self.outbox.send(ctx, embed=embed, view=controls(*BLACKJACK_BUTTONS))
+                self.dispatcher.open(BlackjackSession(self, user_id, reservation, bet_amount, shoe, player_cards, bot_cards), message)
+            except Exception:
+                # No game to settle it later: give the stake back. A natural is already
+                # settled, and settling again does nothing.
+                await self.bank.settle(reservation, bet_amount)
+                raise
+
+    @commands.command(name='odds', help='Show the exact blackjack house edge')
+    @commands.is_owner()
+    async def odds(self, ctx, decks: int = BLACKJACK_DECKS, hit_soft_17: bool = False):
+        rules = blackjack_odds.Rules(decks, BLACKJACK_PAYOUT, hit_soft_17)
+        solution = await asyncio.get_running_loop().run_in_executor(None, blackjack_odds.solve, rules)
+
+        embed = discord.Embed(title="Blackjack Odds", description=rules.describe(), color=0x89CFF0)
+        embed.add_field(name="House Edge", value=f"{solution.house_edge * 100:.3f}%", inline=True)
+        embed.add_field(name="Return to Player", value=f"{(1 + solution.ev) * 100:.3f}%", inline=True)
+        embed.add_field(name="Strategy", value=f"```\n{blackjack_odds.strategy_table(solution)}\n```", inline=False)
+        await self.outbox.send(ctx, embed=embed)
+
+
+async def setup(bot):
+    await bot.add_cog(Blackjack(bot))
@@ -0,0 +1,98 @@
+import discord
+from discord.ext import commands
+
+import fairness
+from payouts import DICE_OVER_RANGE, DICE_UNDER_RANGE, MIN_BET, dice_multiplier, dice_payout, dice_roll, dice_won
+
+
+class Dice(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+        self.bank = bot.bank
+        self.outbox = bot.outbox
+        self.user_locks = bot.user_locks
+
+    @commands.command(name='dice', help='dice idk')
+    async def dice(self, ctx, choice: str = None, number: str = None, bet_amount = None):
+        if choice is None or number is None or bet_amount is None:
+            await self.outbox.send(ctx, "Usage: `.dice [over/under] [number] [bet amount]`")
+            return
+
+        try:
+            bet_amount = int(bet_amount)
+            if not (0 < float(number) < 100):
+                raise ValueError("Number must be between 0 and 100")
+        except ValueError:
+            await self.outbox.send(ctx, "Incorrect usage.\n"
+                                   "Usage: `.dice [over/under] [number] [bet amount]`")
+            return
+
+        if choice.lower() not in ['over', 'under']:
+            await self.outbox.send(ctx, "Invalid choice. Use 'over' or 'under'.\n"
+                                   "Usage: `.dice [over/under] [number] [bet amount]`")
+            return
+
+        if bet_amount < MIN_BET:
+            await self.outbox.send(ctx, f"Please enter a bet amount of at least {MIN_BET}.\n"
+                                   "Usage: `.dice [over/under] [number] [bet amount]`")
+            return
+
+        number = float(number)
+        choice = choice.lower()
+        multiplier = dice_multiplier(choice, number)
+        if multiplier is None:
+            low, high = DICE_OVER_RANGE if choice == 'over' else DICE_UNDER_RANGE
+            await self.outbox.send(ctx, "Invalid number range.\n"
+                                   f"{low} - {high} for {choice} rolls")
+            return
+
+        if dice_payout(bet_amount, multiplier, True) <= bet_amount:
+            await self.outbox.send(ctx, f"A win at {multiplier:.2f}x on {bet_amount} chips rounds down to nothing. "
+                                   "Raise the bet or pick a riskier number.")
+            return
+
+        user_id = ctx.author.id
+        async with self.user_locks.hold(user_id):
+            reservation = await self.bank.reserve(user_id, bet_amount, 'dice')
+
+            if reservation is None:
+                await self.outbox.send(ctx, "You don't have enough chips to place that bet.")
+                return
+
+            _, rng = await fairness.draw(self.bank, user_id, 'dice', [1], reservation)
+            generated_number = dice_roll(rng)
+            won = dice_won(choice, number, generated_number)
+            payout = dice_payout(bet_amount, multiplier, won)
+            await self.bank.settle(reservation, payout)
+
+        if won:
+            winnings = payout - bet_amount
+            if winnings > 1:
+                result_message = (f"You win {winnings} chips!")
+            else:
+                result_message = (f"You win {winnings} chip!")
+            color = 0x00ff00
+        else:
+            if bet_amount > 1:
+                result_message = (f"You lose {bet_amount} chips")
+            else:
+                result_message = (f"You lose {bet_amount} chip")
+            color = 0xff0000
+
+        bar_length = 20
+        bar_position = int((generated_number / 100) * bar_length)
+        bar = '[' + '=' * bar_position + '>' + '-' * (bar_length - bar_position - 1) + ']'
+
+        embed = discord.Embed(title="Dice Roll Result", color=color)
+        embed.add_field(name="Your Choice", value=choice.capitalize(), inline=True)
+        embed.add_field(name="Your Number", value=str(number), inline=True)
+        embed.add_field(name="Your Bet", value=bet_amount, inline=True)
+        embed.add_field(name=f"Rolled Number - {generated_number}", value=f"{bar}", inline=True)
+        embed.add_field(name="Multiplier", value=f"{multiplier:.2f}", inline=True)
+        embed.add_field(name="Winnings/Loss", value=result_message, inline=False)
+
+        await self.outbox.send(ctx, embed=embed)
+
+
+async def setup(bot):
+    await bot.add_cog(Dice(bot))
@@ -0,0 +1,169 @@
+import random
+import time
+from datetime import timedelta
+
+import discord
+from discord.ext import commands
+
+from cooldowns import DAILY_MIN_GAP, HOURLY_COOLDOWN, TIMEZONE_COOLDOWN, is_timezone
+from economy import CLAIM_GAMES, GameDay
+from transactions import DAY
+
+HISTORY_LIMIT = 25
+
+
+class Economy(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+        self.bank = bot.bank
+        self.outbox = bot.outbox
+        self.user_locks = bot.user_locks
+        if getattr(bot, 'timezone_changes', None) is None:
+            bot.timezone_changes = {}
+        self.timezone_changes = bot.timezone_changes
+
+    def day_clock_for(self, guild):
+        day_clocks = self.bot.day_clocks
+        if guild is None:
+            return day_clocks.default
+        return day_clocks.get(self.bot.guild_timezones.get(guild.id, day_clocks.default_timezone))
+
+    @commands.command(name='daily', help='Claim your daily prize')
+    async def daily(self, ctx):
+        user_id = ctx.author.id
+        chips = random.randint(500, 2000)
+
+        async with self.user_locks.hold(user_id):
+            now = int(time.time())
+            day_clock = self.day_clock_for(ctx.guild).at(now)
+            cutoff = min(day_clock.day_start - 1, now - DAILY_MIN_GAP)
+            claimed, claimed_at = await self.bank.claim(user_id, 'daily', chips, now, cutoff)
+
+        if claimed:
+            await self.outbox.send(ctx, f'You claimed your daily and received {chips} chips.')
+        else:
+            next_claim = claimed_at + DAILY_MIN_GAP
+            if claimed_at >= day_clock.day_start:
+                next_claim = max(next_claim, day_clock.next_day_start)
+            time_remaining_str = str(timedelta(seconds=next_claim - now))
+            await self.outbox.send(ctx, f'You already claimed your daily. You can claim your next daily in {time_remaining_str}')
+
+    @commands.command(name='hourly', help='Claim your hourly prize')
+    async def hourly(self, ctx):
+        user_id = ctx.author.id
+        chips = random.randint(100, 200)
+
+        async with self.user_locks.hold(user_id):
+            now = int(time.time())
+            claimed, claimed_at = await self.bank.claim(user_id, 'hourly', chips, now, now - HOURLY_COOLDOWN)
+
+        if claimed:
+            await self.outbox.send(ctx, f'You claimed your hourly and received {chips} chips.')
+        else:
+            time_remaining_str = str(timedelta(seconds=claimed_at + HOURLY_COOLDOWN - now))
+            await self.outbox.send(ctx, f'You already claimed your hourly. You can claim your next hourly in {time_remaining_str}')
+
+    @commands.command(name='timezone', help='Show or set the timezone this server\'s daily resets at')
+    @commands.guild_only()
+    async def timezone(self, ctx, name: str = None):
+        current = self.bot.guild_timezones.get(ctx.guild.id, self.bot.day_clocks.default_timezone)
+        if name is None:
+            await self.outbox.send(ctx, f'Dailies reset at midnight {current}.')
+            return
+
+        if not ctx.author.guild_permissions.manage_guild:
+            await self.outbox.send(ctx, "You need the Manage Server permission to change the timezone.")
+            return
+
+        if not is_timezone(name):
+            await self.outbox.send(ctx, "Unknown timezone. Use a name like `America/New_York` or `Europe/London`.")
+            return
+
+        now = int(time.time())
+        changed_at = self.timezone_changes.get(ctx.guild.id, 0)
+        if now - changed_at < TIMEZONE_COOLDOWN:
+            time_remaining_str = str(timedelta(seconds=changed_at + TIMEZONE_COOLDOWN - now))
+            await self.outbox.send(ctx, f'The timezone was changed recently. You can change it again in {time_remaining_str}')
+            return
+
+        await self.bank.set_guild_timezone(ctx.guild.id, name)
+        self.bot.guild_timezones[ctx.guild.id] = name
+        self.timezone_changes[ctx.guild.id] = now
+        await self.outbox.send(ctx, f'Dailies now reset at midnight {name}.')
+
+    @commands.command(name='balance', aliases=['bal'], help='View your current balance')
+    async def balance(self, ctx):
+        chips = await self.bank.balance(ctx.author.id)
+
+        await self.outbox.send(ctx, f'Balance: {chips} chips')
+
+    @commands.command(name='rank', help='View your position on the leaderboard')
+    async def rank(self, ctx):
+        position, chips = await self.bank.rank(ctx.author.id)
+
+        await self.outbox.send(ctx, f'Rank: #{position} with {chips} chips')
+
+    @commands.command(name='history', help='View your recent bets and claims')
+    async def history(self, ctx, count: int = 10):
+        count = min(max(count, 1), HISTORY_LIMIT)
+        rows = await self.bank.history(ctx.author.id, count)
+
+        if not rows:
+            await self.outbox.send(ctx, "No transactions yet.")
+            return
+
+        lines = []
+        for game, stake, payout, created_at, game_id in rows:
+            if game_id is not None:
+                game = f"{game} #{game_id}"
+            lines.append(f"<t:{created_at}:R> **{game}**: bet {stake}, paid {payout} ({payout - stake:+})")
+
+        embed = discord.Embed(title="History", description="\n".join(lines), color=0x89CFF0)
+        embed.set_footer(text=f"Last {len(rows)} transactions")
+        await self.outbox.send(ctx, embed=embed)
+
+    @commands.command(name='profit', help='Show house profit for a game')
+    @commands.is_owner()
+    async def profit(self, ctx, game: str, days: int = 1):
+        end = int(time.time())
+        rounds, stake, payout = await self.bank.game_totals(game, end - days * DAY, end)
+
+        embed = discord.Embed(title=f"{game} - last {days} day(s)", color=0x89CFF0)
+        embed.add_field(name="Rounds", value=str(rounds), inline=True)
+        embed.add_field(name="Wagered", value=f"{stake} chips", inline=True)
+        embed.add_field(name="Paid Out", value=f"{payout} chips", inline=True)
+        embed.add_field(name="House Profit", value=f"{stake - payout} chips", inline=True)
+        if stake:
+            embed.add_field(name="Hold", value=f"{(stake - payout) / stake * 100:.2f}%", inline=True)
+        await self.outbox.send(ctx, embed=embed)
+
+    @commands.command(name='stats', help='Show economy totals')
+    @commands.is_owner()
+    async def stats(self, ctx, days: int = 7):
+        days = min(max(days, 1), 90)
+        report = await self.bank.economy_report(days)
+
+        totals = {}
+        for _, game, rounds, handle, payout in report['days']:
+            totals.setdefault(game, GameDay()).add(rounds, handle, payout)
+
+        embed = discord.Embed(title=f"Economy - last {days} day(s)", color=0x89CFF0)
+        embed.add_field(name="Supply", value=f"{report['supply']} chips", inline=True)
+        embed.add_field(name="Active Today", value=str(report['active_today']), inline=True)
+        embed.add_field(name="Active (avg/day)", value=f"{sum(users for _, users in report['active']) / days:.1f}", inline=True)
+
+        for game, game_totals in sorted(totals.items()):
+            if game in CLAIM_GAMES:
+                value = f"{game_totals.rounds} claims, {game_totals.payout} chips"
+            else:
+                hold = f"{game_totals.hold * 100:.2f}%" if game_totals.hold is not None else "-"
+                value = (f"{game_totals.rounds} rounds\n"
+                         f"Handle {game_totals.handle}, paid {game_totals.payout}\n"
+                         f"Hold {hold}")
+            embed.add_field(name=game.capitalize(), value=value, inline=True)
+
+        await self.outbox.send(ctx, embed=embed)
+
+
+async def setup(bot):
+    await bot.add_cog(Economy(bot))
@@ -0,0 +1,76 @@
+import discord
+from discord.ext import commands
+
+from dispatcher import PAGE_BUTTONS, Session, controls
+
+LEADERBOARD_PAGE_SIZE = 10
+
+
+class LeaderboardSession(Session):
+    timeout = 30.0
+
+    def __init__(self, cog, user_id, current_page, user_data):
+        super().__init__(user_id)
+        self.cog = cog
+        self.current_page = current_page
+        self.user_data = user_data
+
+    async def on_action(self, interaction, action):
+        if action == 'previous' and self.current_page > 0:
+            self.current_page -= 1
+        elif action == 'next' and len(self.user_data) > LEADERBOARD_PAGE_SIZE:
+            self.current_page += 1
+        else:
+            await interaction.response.defer()
+            return
+
+        self.user_data = await self.cog.leaderboard_page(self.current_page)
+        await interaction.response.edit_message(embed=await self.cog.leaderboard_embed(self.user_data, self.current_page))
+
+    async def on_timeout(self):
+        await self.cog.outbox.edit(self.message, view=None)
+
+
+class Leaderboard(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+        self.bank = bot.bank
+        self.outbox = bot.outbox
+        self.dispatcher = bot.dispatcher
+        self.usernames = bot.usernames
+
+    async def leaderboard_page(self, page):
+        # One extra row tells us whether there is a next page without counting the table.
+        return await self.bank.leaderboard(page * LEADERBOARD_PAGE_SIZE, LEADERBOARD_PAGE_SIZE + 1)
+
+    async def leaderboard_embed(self, user_data, page):
+        embed = discord.Embed(title="Leaderboard", color=0xff9900)
+
+        for index, (user_id, balance) in enumerate(user_data[:LEADERBOARD_PAGE_SIZE], start=page * LEADERBOARD_PAGE_SIZE + 1):
+            username = await self.usernames.resolve(user_id)
+            embed.add_field(name=f"{index}. {username}", value=f"{balance} chips", inline=False)
+
+        embed.set_footer(text=f"Page {page + 1}")
+        return embed
+
+    @commands.command(name='leaderboard', aliases=['lb'], help='View the top coin earners')
+    async def leaderboard(self, ctx, page: int = 1):
+        current_page = max(page, 1) - 1
+        user_data = await self.leaderboard_page(current_page)
+
+        if not user_data:
+            await self.outbox.send(ctx, "No users found.")
+            return
+
+        embed = await self.leaderboard_embed(user_data, current_page)
+
+        if current_page == 0 and len(user_data) <= LEADERBOARD_PAGE_SIZE:
+            await self.outbox.send(ctx, embed=embed)
+            return
+
+        message = await self.outbox.send(ctx, embed=embed, view=controls(*PAGE_BUTTONS))
+        self.dispatcher.open(LeaderboardSession(self, ctx.author.id, current_page, user_data), message)
+
+
+async def setup(bot):
+    await bot.add_cog(Leaderboard(bot))
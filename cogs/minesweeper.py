@@ -0,0 +1,154 @@
+import discord
+from discord.ext import commands
+
+import fairness
+import minesweeper
+from dispatcher import CUSTOM_ID_PREFIX, Session
+from minesweeper import CELLS, COLUMNS, MINES, Board
+
+HIDDEN = '\u200b'
+
+
+def board_view(board, finished=False):
+    # One button per cell, then the controls on the last row. Built by hand rather than
+    # with controls() because cells change label and get disabled as they open.
+    view = discord.ui.View(timeout=None)
+    for cell in range(CELLS):
+        row = cell // COLUMNS
+        if finished and board.is_mine(cell):
+            style = discord.ButtonStyle.danger if board.is_revealed(cell) else discord.ButtonStyle.secondary
+            button = discord.ui.Button(emoji="💣", style=style, row=row)
+        elif board.is_revealed(cell):
+            button = discord.ui.Button(emoji="💎", style=discord.ButtonStyle.success, row=row)
+        else:
+            button = discord.ui.Button(label=HIDDEN, style=discord.ButtonStyle.secondary, row=row)
+        button.custom_id = f'{CUSTOM_ID_PREFIX}:{cell}'
+        button.disabled = finished or board.is_revealed(cell)
+        view.add_item(button)
+
+    if not finished:
+        view.add_item(discord.ui.Button(custom_id=f'{CUSTOM_ID_PREFIX}:cashout', label="Cash out", emoji="💰",
+                                        style=discord.ButtonStyle.success, row=CELLS // COLUMNS))
+    view.stop()
+    return view
+
+
+def minesweeper_embed(bet_amount, mines, picks, result=None, color=0xff9900):
+    embed = discord.Embed(title="Minesweeper", color=color)
+    embed.add_field(name="Mines", value=mines, inline=True)
+    embed.add_field(name="Multiplier", value=f"{float(minesweeper.multiplier(mines, picks)):.2f}", inline=True)
+    embed.add_field(name="Cash out", value=f"{minesweeper.payout(bet_amount, mines, picks)} chips", inline=True)
+    if result is not None:
+        embed.add_field(name="Result", value=result, inline=False)
+    embed.set_footer(text=f"Bet Amount: {bet_amount} chips")
+    return embed
+
+
+class MinesweeperSession(Session):
+    timeout = 120.0
+
+    def __init__(self, cog, user_id, reservation, bet_amount, board, mines):
+        super().__init__(user_id)
+        self.cog = cog
+        self.reservation = reservation
+        self.bet_amount = bet_amount
+        self.board = board
+        self.mines = mines
+        # The multiplier goes up per cell the player picks.
+        self.picks = 0
+
+    async def on_action(self, interaction, action):
+        if action == 'cashout':
+            await self.cash_out(interaction, "You cashed out")
+            return
+
+        cell = int(action)
+        board = self.board
+        if board.is_revealed(cell):
+            await interaction.response.defer()
+            return
+
+        if not board.reveal(cell):
+            self.cog.dispatcher.close(self)
+            await self.cog.bank.settle(self.reservation, 0)
+            embed = minesweeper_embed(self.bet_amount, self.mines, self.picks,
+                                      f"Boom! You hit a mine. -{self.bet_amount} chips.", 0xff0000)
+            await interaction.response.edit_message(embed=embed, view=board_view(board, finished=True))
+            return
+
+        self.picks += 1
+        if board.cleared:
+            await self.cash_out(interaction, "Board cleared! You win")
+            return
+        await interaction.response.edit_message(embed=minesweeper_embed(self.bet_amount, self.mines, self.picks),
+                                                view=board_view(board))
+
+    async def cash_out(self, interaction, result):
+        self.cog.dispatcher.close(self)
+        payout = minesweeper.payout(self.bet_amount, self.mines, self.picks)
+        await self.cog.bank.settle(self.reservation, payout)
+        embed = minesweeper_embed(self.bet_amount, self.mines, self.picks,
+                                  f"{result} {payout} chips ({payout - self.bet_amount:+d}).", 0x00ff00)
+        await interaction.response.edit_message(embed=embed, view=board_view(self.board, finished=True))
+
+    async def on_timeout(self):
+        # Chips already won are kept: an idle game is cashed out, not forfeited.
+        payout = minesweeper.payout(self.bet_amount, self.mines, self.picks)
+        await self.cog.bank.settle(self.reservation, payout)
+        await self.cog.outbox.edit(self.message, content=f"Took too long to pick, cashed out {payout} chips.",
+                                   view=board_view(self.board, finished=True))
+
+
+class Minesweeper(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+        self.bank = bot.bank
+        self.outbox = bot.outbox
+        self.dispatcher = bot.dispatcher
+        self.user_locks = bot.user_locks
+
+    @commands.command(name='minesweeper', aliases=['ms'], help='Open boxes and avoid bombs')
+    async def minesweeper(self, ctx, bet_amount = None, mines = None):
+        if bet_amount is None:
+            await self.outbox.send(ctx, "Usage: `.minesweeper [bet amount] [mines]`")
+            return
+
+        try:
+            bet_amount = int(bet_amount)
+            mines = MINES if mines is None else int(mines)
+        except ValueError:
+            await self.outbox.send(ctx, "Please enter a valid bet amount and number of mines.\n"
+                                   "Usage: `.minesweeper [bet amount] [mines]`")
+            return
+
+        if bet_amount <= 0:
+            await self.outbox.send(ctx, "Please enter a bet amount greater than 0.\n"
+                                   "Usage: `.minesweeper [bet amount] [mines]`")
+            return
+
+        if not 0 < mines < CELLS:
+            await self.outbox.send(ctx, f"The number of mines must be between 1 and {CELLS - 1}.")
+            return
+
+        user_id = ctx.author.id
+        async with self.user_locks.hold(user_id):
+            reservation = await self.bank.reserve(user_id, bet_amount, 'minesweeper')
+
+            if reservation is None:
+                await self.outbox.send(ctx, "You don't have enough chips to place that bet.")
+                return
+
+            try:
+                _, rng = await fairness.draw(self.bank, user_id, 'minesweeper', [mines], reservation)
+                board = Board.deal(mines, rng)
+                message = await self.outbox.send(ctx, embed=minesweeper_embed(bet_amount, mines, 0),
+                                                 view=board_view(board))
+                self.dispatcher.open(MinesweeperSession(self, user_id, reservation, bet_amount, board, mines), message)
+            except Exception:
+                # No game to settle it later: give the stake back.
+                await self.bank.settle(reservation, bet_amount)
+                raise
+
+
+async def setup(bot):
+    await bot.add_cog(Minesweeper(bot))
@@ -0,0 +1,113 @@
+import discord
+from discord.ext import commands
+
+from cards import format_cards
+from fairness import FairRandom, replay
+from minesweeper import CELLS, COLUMNS
+from payouts import COIN_FACES, RPS_CHOICES
+
+REPLAY_SHOWN = 20
+
+
+def describe(game, outcome):
+    if game == 'dice':
+        rolls = ', '.join(f"{roll:.2f}" for roll in outcome[:REPLAY_SHOWN])
+        more = f" (first {REPLAY_SHOWN} of {len(outcome)})" if len(outcome) > REPLAY_SHOWN else ""
+        return f"Rolled {rolls}{more}"
+    if game == 'coinflip':
+        faces = ''.join(COIN_FACES[flip] for flip in outcome[:REPLAY_SHOWN])
+        more = f" (first {REPLAY_SHOWN} of {len(outcome)})" if len(outcome) > REPLAY_SHOWN else ""
+        return f"Coin landed on {faces}{more}"
+    if game == 'rps':
+        return f"Bot chose {RPS_CHOICES[outcome]}"
+    if game == 'blackjack':
+        return (f"First {len(outcome)} cards, in the order dealt (you, you, dealer, dealer, then hits):\n"
+                f"{format_cards(outcome)}")
+    if game == 'minesweeper':
+        cells = ''.join("💣" if outcome >> cell & 1 else "⬜" for cell in range(CELLS))
+        return '\n'.join(cells[row:row + COLUMNS] for row in range(0, CELLS, COLUMNS))
+    return str(outcome)
+
+
+class ProvablyFair(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+        self.bank = bot.bank
+        self.outbox = bot.outbox
+        self.user_locks = bot.user_locks
+
+    @commands.group(name='seed', invoke_without_command=True, help='Show your provably fair seed')
+    async def seed(self, ctx):
+        server_hash, client_seed, nonce = await self.bank.fair_seed(ctx.author.id)
+        embed = discord.Embed(title="Provably Fair Seed", color=0x89CFF0)
+        embed.add_field(name="Server Seed (SHA-256)", value=f"`{server_hash}`", inline=False)
+        embed.add_field(name="Client Seed", value=f"`{client_seed}`", inline=True)
+        embed.add_field(name="Bets Made", value=str(nonce), inline=True)
+        embed.set_footer(text="Use .seed rotate [client seed] to reveal the server seed and start a new one")
+        await self.outbox.send(ctx, embed=embed)
+
+    @seed.command(name='rotate', help='Reveal your server seed and start a new one')
+    async def seed_rotate(self, ctx, client_seed: str = None):
+        if client_seed is not None and not 0 < len(client_seed) <= 64:
+            await self.outbox.send(ctx, "The client seed can be at most 64 characters.")
+            return
+
+        async with self.user_locks.hold(ctx.author.id):
+            rotated = await self.bank.rotate_seed(ctx.author.id, client_seed)
+        if rotated is None:
+            await self.outbox.send(ctx, "Finish your open games before rotating your seed.")
+            return
+        old, new = rotated
+        server_seed, server_hash, old_client_seed, nonce = old
+        new_hash, new_client_seed = new
+
+        embed = discord.Embed(title="Seed Rotated", color=0x89CFF0)
+        embed.add_field(name="Revealed Server Seed", value=f"`{server_seed}`", inline=False)
+        embed.add_field(name="Its SHA-256", value=f"`{server_hash}`", inline=False)
+        embed.add_field(name="Client Seed", value=f"`{old_client_seed}`", inline=True)
+        embed.add_field(name="Bets Made", value=str(nonce), inline=True)
+        embed.add_field(name="New Server Seed (SHA-256)", value=f"`{new_hash}`", inline=False)
+        embed.add_field(name="New Client Seed", value=f"`{new_client_seed}`", inline=True)
+        await self.outbox.send(ctx, embed=embed)
+
+    @commands.command(name='verify', help='Check a past game against its revealed seed')
+    async def verify(self, ctx, game_id = None):
+        try:
+            game_id = int(str(game_id).lstrip('#'))
+        except ValueError:
+            await self.outbox.send(ctx, "Usage: `.verify [game id]`\n"
+                                   "Game ids are shown in `.history`.")
+            return
+
+        bet = await self.bank.fair_bet(game_id)
+        if bet is None:
+            await self.outbox.send(ctx, f"Game #{game_id} has no provably fair record.")
+            return
+
+        embed = discord.Embed(title=f"Verify Game #{game_id} - {bet['game']}", color=0x89CFF0)
+        embed.add_field(name="Server Seed (SHA-256)", value=f"`{bet['server_seed_hash']}`", inline=False)
+        embed.add_field(name="Client Seed", value=f"`{bet['client_seed']}`", inline=True)
+        embed.add_field(name="Nonce", value=str(bet['nonce']), inline=True)
+        if bet['rounds']:
+            embed.add_field(name="Recorded",
+                            value=f"{bet['rounds']} round(s), staked {bet['stake']}, paid {bet['payout']}", inline=True)
+
+        server_seed = bet['server_seed']
+        if server_seed is None:
+            embed.add_field(name="Server Seed", value="Still in use. The player can reveal it with `.seed rotate`.",
+                            inline=False)
+            await self.outbox.send(ctx, embed=embed)
+            return
+
+        # The hash above is the one .seed showed while the seed was in use; anyone can
+        # check it is the SHA-256 of this server seed.
+        outcome = replay(bet['game'], bet['params'], FairRandom(server_seed, bet['client_seed'], bet['nonce']))
+        embed.color = 0x00ff00
+        embed.add_field(name="Server Seed", value=f"`{server_seed}`", inline=False)
+        embed.add_field(name="Outcome", value=describe(bet['game'], outcome), inline=False)
+        embed.set_footer(text="Each number is read from HMAC-SHA256(server seed, 'client seed:nonce:counter')")
+        await self.outbox.send(ctx, embed=embed)
+
+
+async def setup(bot):
+    await bot.add_cog(ProvablyFair(bot))
@@ -0,0 +1,184 @@
+import discord
+from discord.ext import commands
+
+import fairness
+from dispatcher import Session, controls
+from payouts import (COIN_FACES, RPS_CHOICES, RPS_TIE, RPS_WIN, coin_flip, coinflip_payout, rps_outcome, rps_payout,
+                     rps_pick)
+
+
+class RpsSession(Session):
+    timeout = 30.0
+
+    def __init__(self, cog, user_id, reservation, bet_amount, rng):
+        super().__init__(user_id)
+        self.cog = cog
+        self.reservation = reservation
+        self.bet_amount = bet_amount
+        self.rng = rng
+
+    async def on_action(self, interaction, action):
+        self.cog.dispatcher.close(self)
+        user_choice = int(action)
+        bot_choice = rps_pick(self.rng)
+        outcome = rps_outcome(user_choice, bot_choice)
+        await self.cog.bank.settle(self.reservation, rps_payout(self.bet_amount, outcome))
+
+        player_choice = f"You chose {RPS_CHOICES[user_choice]}"
+        bot_message = f"Bot chose {RPS_CHOICES[bot_choice]} "
+
+        if outcome == RPS_TIE:
+            result_message = (f"{player_choice}\n"
+                              f"{bot_message}\n"
+                              "It's a tie!")
+            color = 0xffff00
+        elif outcome == RPS_WIN:
+            result_message = (f"{player_choice}\n"
+                              f"{bot_message}\n"
+                              f"You win! +{self.bet_amount} coins.")
+            color = 0x00ff00
+        else:
+            result_message = (f"{player_choice}\n"
+                              f"{bot_message}\n"
+                              f"You lose. -{self.bet_amount} coins.")
+            color = 0xff0000
+
+        embed = discord.Embed(title="Rock, Paper, Scissors", description=result_message, color=color)
+        embed.set_footer(text=f"Bet Amount: {self.bet_amount} chips")
+        await interaction.response.edit_message(embed=embed, view=None)
+
+    async def on_timeout(self):
+        await self.cog.bank.settle(self.reservation, self.bet_amount)
+        await self.cog.outbox.edit(self.message, content="Took too long to pick, please try again.", view=None)
+
+
+class CoinflipSession(Session):
+    timeout = 30.0
+
+    def __init__(self, cog, user_id, reservation, bet_amount, rng):
+        super().__init__(user_id)
+        self.cog = cog
+        self.reservation = reservation
+        self.bet_amount = bet_amount
+        self.rng = rng
+
+    async def on_action(self, interaction, action):
+        self.cog.dispatcher.close(self)
+        user_choice = int(action)
+        flip = coin_flip(self.rng)
+        flip_message = f"Coin landed on {COIN_FACES[flip]}."
+
+        won = user_choice == flip
+        await self.cog.bank.settle(self.reservation, coinflip_payout(self.bet_amount, won))
+
+        if won:
+            result_message = (f"{flip_message}\n"
+                              "You win!\n"
+                              f"+{self.bet_amount} coins.")
+        else:
+            result_message = (f"{flip_message}\n"
+                              "You lose.\n"
+                              f"-{self.bet_amount} coins.")
+
+        embed = discord.Embed(title="Heads or Tails", description=result_message, color=0x00ff00 if won else 0xff0000)
+        embed.set_footer(text=f"Bet Amount: {self.bet_amount} chips")
+        await interaction.response.edit_message(embed=embed, view=None)
+
+    async def on_timeout(self):
+        await self.cog.bank.settle(self.reservation, self.bet_amount)
+        await self.cog.outbox.edit(self.message, content="Took too long to pick, please try again.", view=None)
+
+
+RPS_BUTTONS = [(str(index), label, emoji, discord.ButtonStyle.secondary)
+               for index, (emoji, label) in enumerate(zip(RPS_CHOICES, ["Rock", "Paper", "Scissors"]))]
+COINFLIP_BUTTONS = [(str(index), label, emoji, discord.ButtonStyle.secondary)
+                    for index, (emoji, label) in enumerate(zip(COIN_FACES, ["Heads", "Tails"]))]
+
+
+class RpsCoinflip(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+        self.bank = bot.bank
+        self.outbox = bot.outbox
+        self.dispatcher = bot.dispatcher
+        self.user_locks = bot.user_locks
+
+    @commands.command(name='rps', help='Play rock-paper-scissors against the bot')
+    async def rps(self, ctx, bet_amount = None):
+        if bet_amount is None:
+            await self.outbox.send(ctx, "Usage: `.rps [bet amount]`")
+            return
+
+        try:
+            bet_amount = int(bet_amount)
+        except ValueError:
+            await self.outbox.send(ctx, "Please enter a valid bet amount.\n"
+                                   "Usage: `.rps [bet amount]`")
+            return
+
+        if bet_amount <= 0:
+            await self.outbox.send(ctx, "Please enter a bet amount greater than 0.\n"
+                                   "Usage: `.rps [bet amount]`")
+            return
+
+        user_id = ctx.author.id
+        async with self.user_locks.hold(user_id):
+            reservation = await self.bank.reserve(user_id, bet_amount, 'rps')
+
+            if reservation is None:
+                await self.outbox.send(ctx, "You don't have enough chips to place that bet.")
+                return
+
+            try:
+                # The bot's pick is fixed by the seed before the player chooses.
+                _, rng = await fairness.draw(self.bank, user_id, 'rps', [], reservation)
+                embed = discord.Embed(title="Rock, Paper, Scissors", description="Pick your choice:", color=0xff9900)
+                embed.set_footer(text=f"Bet Amount: {bet_amount} chips")
+
+                message = await self.outbox.send(ctx, embed=embed, view=controls(*RPS_BUTTONS))
+                self.dispatcher.open(RpsSession(self, user_id, reservation, bet_amount, rng), message)
+            except Exception:
+                # No game to settle it later: give the stake back.
+                await self.bank.settle(reservation, bet_amount)
+                raise
+
+    @commands.command(name='coinflip', aliases=['cf'], help='Flip a coin')
+    async def coinflip(self, ctx, bet_amount = None):
+        if bet_amount is None:
+            await self.outbox.send(ctx, "Usage: `.cf [bet amount]`")
+            return
+
+        try:
+            bet_amount = int(bet_amount)
+        except ValueError:
+            await self.outbox.send(ctx, "Please enter a valid bet amount.\n"
+                                   "Usage: `.cf [bet amount]`")
+            return
+
+        if bet_amount <= 0:
+            await self.outbox.send(ctx, "Please enter a bet amount greater than 0.\n"
+                                   "Usage: `.cf [bet amount]`")
+            return
+
+        user_id = ctx.author.id
+        async with self.user_locks.hold(user_id):
+            reservation = await self.bank.reserve(user_id, bet_amount, 'coinflip')
+
+            if reservation is None:
+                await self.outbox.send(ctx, "You don't have enough chips to place that bet.")
+                return
+
+            try:
+                _, rng = await fairness.draw(self.bank, user_id, 'coinflip', [1], reservation)
+                embed = discord.Embed(title="Heads or Tails", description="Pick your choice:", color=0xff9900)
+                embed.set_footer(text=f"Bet Amount: {bet_amount} chips")
+
+                message = await self.outbox.send(ctx, embed=embed, view=controls(*COINFLIP_BUTTONS))
+                self.dispatcher.open(CoinflipSession(self, user_id, reservation, bet_amount, rng), message)
+            except Exception:
+                await self.bank.settle(reservation, bet_amount)
+                raise
+
+
+async def setup(bot):
+    await bot.add_cog(RpsCoinflip(bot))
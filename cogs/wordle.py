@@ -0,0 +1,81 @@
+import os
+from datetime import datetime
+
+import discord
+from discord.ext import commands, tasks
+
+import wordle_words
+from wordle import WordleSessions, render_score
+
+WORDLE_DAILY = os.getenv("WORDLE_DAILY") == "1"
+WORDLE_SESSION_TTL = int(os.getenv("WORDLE_SESSION_TTL", 30 * 60))
+
+
+def pick_wordle_answer():
+    if WORDLE_DAILY:
+        return wordle_words.daily_answer_index(datetime.now().date())
+    return wordle_words.random_answer_index()
+
+
+class Wordle(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+        self.outbox = bot.outbox
+        # Kept on the bot so games in progress survive reloading this extension.
+        if getattr(bot, 'wordle_sessions', None) is None:
+            bot.wordle_sessions = WordleSessions(ttl=WORDLE_SESSION_TTL, pick_answer=pick_wordle_answer)
+        self.sessions = bot.wordle_sessions
+        bot.metrics.gauge('wordle_sessions', 'Wordle games in progress', lambda: len(self.sessions))
+
+    async def cog_load(self):
+        self.evict_sessions.start()
+
+    async def cog_unload(self):
+        self.evict_sessions.cancel()
+
+    @tasks.loop(seconds=60)
+    async def evict_sessions(self):
+        self.sessions.evict_expired()
+
+    @commands.command(name='wordle', help='Guess the 5 letter word before running out of tries')
+    async def wordle(self, ctx, *, user_word: str):
+        gradient = {
+            5: 0x97D112,
+            4: 0xCBD112,
+            3: 0xD1A012,
+            2: 0xD16312,
+            1: 0xD11212
+        }
+
+        key = (ctx.guild.id if ctx.guild else 0, ctx.channel.id, ctx.author.id)
+        session = self.sessions.get(key)
+        color = gradient.get(session.tries_left, 0x3DD112)
+
+        guess = user_word.upper()
+        if not guess.isalpha() or len(guess) != 5 or not wordle_words.is_valid_word(guess):
+            await self.outbox.send(ctx, "Please enter a valid 5-letter English word")
+            return
+
+        game_won = session.play(guess)
+
+        embed = discord.Embed(title=f"Wordle - Tries Left: {session.tries_left}", color=color)
+        played = list(session.results())
+        guesses = "\n".join([f"`{word}`" for word, _ in played])
+        results = "\n".join([render_score(packed) for _, packed in played])
+
+        if game_won:
+            embed.color = 0x3DD112
+            embed.add_field(name="Congratulations!", value=f"You've guessed the word: {session.answer}!", inline=False)
+            self.sessions.end(key)
+        elif session.tries_left <= 0:
+            embed.add_field(name="Game Over", value=f"Sorry, you've run out of tries. The word was: {session.answer}", inline=False)
+            self.sessions.end(key)
+
+        embed.add_field(name="Previous Guesses", value=guesses, inline=True)
+        embed.add_field(name="Result", value=results, inline=True)
+
+        await self.outbox.send(ctx, embed=embed)
+
+
+async def setup(bot):
+    await bot.add_cog(Wordle(bot))
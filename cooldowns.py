@@ -0,0 +1,61 @@
+from datetime import datetime, time, timedelta
+
+import discord
+import pytz
+
+DEFAULT_TIMEZONE = 'America/New_York'
+HOURLY_COOLDOWN = 60 * 60
+# The claim time is per user but the day boundary is per server, so without a floor on
+# the gap a player could claim just after midnight in one server and again in another
+# whose midnight comes later.
+DAILY_MIN_GAP = 20 * 60 * 60
+TIMEZONE_COOLDOWN = 24 * 60 * 60
+
+
+def local_midnight(timezone, day):
+    # localize() rather than tzinfo= so the offset is right on DST change days.
+    return timezone.localize(datetime.combine(day, time()))
+
+
+class DayClock:
+    # Start of the current local day, kept as epoch seconds. A daily claim is available
+    # again once the stored claim time is before day_start, so nothing has to touch the
+    # claimed rows when the day changes, and a claim compares two ints.
+
+    def __init__(self, timezone=DEFAULT_TIMEZONE):
+        self.timezone = pytz.timezone(timezone)
+        self.roll()
+
+    def roll(self):
+        day = datetime.now(self.timezone).date()
+        self.day_start = int(local_midnight(self.timezone, day).timestamp())
+        self.next_day_start = int(local_midnight(self.timezone, day + timedelta(days=1)).timestamp())
+
+    def at(self, now):
+        if now >= self.next_day_start:
+            self.roll()
+        return self
+
+    async def wait_for_midnight(self):
+        await discord.utils.sleep_until(datetime.fromtimestamp(self.next_day_start, self.timezone))
+        self.roll()
+        return self.day_start
+
+
+class DayClocks:
+    # One DayClock per timezone name, built on first use.
+
+    def __init__(self, default=DEFAULT_TIMEZONE):
+        self.default_timezone = default
+        self.default = DayClock(default)
+        self._clocks = {default: self.default}
+
+    def get(self, timezone):
+        clock = self._clocks.get(timezone)
+        if clock is None:
+            clock = self._clocks[timezone] = DayClock(timezone)
+        return clock
+
+
+def is_timezone(name):
+    return name in pytz.all_timezones_set
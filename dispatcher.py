@@ -0,0 +1,178 @@
+import asyncio
+import collections
+import math
+import time
+
+import discord
+
+CUSTOM_ID_PREFIX = 'casino'
+TICK = 1.0
+SLOTS = 128
+
+
+class TimerWheel:
+    # Hashed timer wheel: one task advances a cursor every tick and fires whatever is due
+    # in that slot, so thousands of pending timeouts cost one sleeping coroutine in total.
+
+    def __init__(self, tick=TICK, slots=SLOTS):
+        self.tick = tick
+        self._slots = [{} for _ in range(slots)]
+        self._where = {}
+        self._cursor = 0
+        self._task = None
+
+    def __len__(self):
+        return len(self._where)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def schedule(self, key, delay, callback):
+        self.cancel(key)
+        ticks = max(1, math.ceil(delay / self.tick))
+        index = (self._cursor + ticks) % len(self._slots)
+        self._slots[index][key] = [(ticks - 1) // len(self._slots), callback]
+        self._where[key] = index
+
+    def cancel(self, key):
+        index = self._where.pop(key, None)
+        if index is not None:
+            del self._slots[index][key]
+
+    def advance(self):
+        self._cursor = (self._cursor + 1) % len(self._slots)
+        slot = self._slots[self._cursor]
+        due = []
+        for key, entry in slot.items():
+            if entry[0] == 0:
+                due.append((key, entry[1]))
+            else:
+                entry[0] -= 1
+        for key, callback in due:
+            del slot[key]
+            del self._where[key]
+            callback()
+
+    async def _run(self):
+        next_tick = time.monotonic() + self.tick
+        while True:
+            await asyncio.sleep(max(0.0, next_tick - time.monotonic()))
+            # Catch up on ticks missed while the loop was busy instead of drifting.
+            while next_tick <= time.monotonic():
+                self.advance()
+                next_tick += self.tick
+
+
+class Session:
+    # A game or menu attached to one message. Sessions are plain state machines: the
+    # dispatcher calls on_action() for each button press and on_timeout() once idle, and
+    # nothing runs in between.
+    timeout = 60.0
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.message = None
+
+    async def on_action(self, interaction, action):
+        raise NotImplementedError
+
+    async def on_timeout(self):
+        pass
+
+
+def controls(*buttons):
+    # Builds the components for a session message. The view is stopped before it is sent
+    # so discord.py does not track it; presses come back through Dispatcher.dispatch.
+    view = discord.ui.View(timeout=None)
+    for action, label, emoji, style in buttons:
+        view.add_item(discord.ui.Button(custom_id=f'{CUSTOM_ID_PREFIX}:{action}', label=label, emoji=emoji, style=style))
+    view.stop()
+    return view
+
+
+PAGE_BUTTONS = [
+    ('previous', None, "⬅️", discord.ButtonStyle.secondary),
+    ('next', None, "➡️", discord.ButtonStyle.secondary),
+]
+
+
+class Dispatcher:
+    def __init__(self, tick=TICK, slots=SLOTS, locks=None):
+        self.wheel = TimerWheel(tick, slots)
+        self.locks = locks
+        self.dispatched = 0
+        self.timeouts = 0
+        self._sessions = {}
+        self._by_user = collections.defaultdict(set)
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def start(self):
+        self.wheel.start()
+
+    def open(self, session, message):
+        session.message = message
+        self._sessions[message.id] = session
+        self._by_user[session.user_id].add(message.id)
+        self.touch(session)
+
+    def close(self, session):
+        if session.message is None:
+            return
+        message_id = session.message.id
+        if self._sessions.pop(message_id, None) is None:
+            return
+        self.wheel.cancel(message_id)
+        user_sessions = self._by_user[session.user_id]
+        user_sessions.discard(message_id)
+        if not user_sessions:
+            del self._by_user[session.user_id]
+
+    def is_open(self, session):
+        return session.message is not None and self._sessions.get(session.message.id) is session
+
+    def touch(self, session):
+        self.wheel.schedule(session.message.id, session.timeout, lambda: self._expire(session))
+
+    def sessions_for(self, user_id):
+        return [self._sessions[message_id] for message_id in self._by_user.get(user_id, ())]
+
+    def _expire(self, session):
+        self.close(session)
+        self.timeouts += 1
+        asyncio.ensure_future(session.on_timeout())
+
+    async def dispatch(self, interaction):
+        if interaction.type is not discord.InteractionType.component:
+            return
+        prefix, _, action = interaction.data.get('custom_id', '').partition(':')
+        if prefix != CUSTOM_ID_PREFIX:
+            return
+
+        session = self._sessions.get(interaction.message.id)
+        if session is None:
+            await interaction.response.send_message("This game has already ended.", ephemeral=True)
+            return
+        if interaction.user.id != session.user_id:
+            await interaction.response.send_message("This isn't your game.", ephemeral=True)
+            return
+
+        self.dispatched += 1
+        self.touch(session)
+        if self.locks is None:
+            await session.on_action(interaction, action)
+            return
+        # A press has to be answered within seconds, so it is turned away rather than
+        # queued behind the same user's move that is still playing out.
+        if self.locks.locked(session.user_id):
+            await interaction.response.send_message("Hang on, your last move is still being played.", ephemeral=True)
+            return
+        async with self.locks.hold(session.user_id):
+            await session.on_action(interaction, action)
@@ -0,0 +1,136 @@
+import collections
+import time
+
+CLAIM_GAMES = ('daily', 'hourly')
+
+
+class GameDay:
+    __slots__ = ('rounds', 'handle', 'payout')
+
+    def __init__(self, rounds=0, handle=0, payout=0):
+        self.rounds = rounds
+        self.handle = handle
+        self.payout = payout
+
+    def add(self, rounds, handle, payout):
+        self.rounds += rounds
+        self.handle += handle
+        self.payout += payout
+
+    @property
+    def hold(self):
+        if not self.handle:
+            return None
+        return (self.handle - self.payout) / self.handle
+
+
+class EconomyStats:
+    # Running totals kept up to date as bets settle and claims pay out, so questions like
+    # "chips in circulation" or "what did dice hold this week" read a handful of rows
+    # instead of scanning balances or the transaction history. Changes accumulate in
+    # memory and are written as increments in the same flush as the balances.
+    #
+    # Supply counts chips in balances plus chips held in open bets, so reserving a bet
+    # does not change it; only the payout minus the stake, or a claim, does.
+
+    def __init__(self, accounts, day_clock):
+        self.accounts = accounts
+        self.day_clock = day_clock
+        self.supply = 0
+        self._supply_delta = 0
+        self._games = collections.defaultdict(GameDay)
+        self._day = None
+        self._active_today = set()
+        self._new_active = []
+        accounts.add_flusher(self._collect)
+
+    @property
+    def active_today(self):
+        return len(self._active_today)
+
+    async def load(self):
+        day = self._today()
+        self.supply, active = await self.accounts.ledger.run(_load, day)
+        self._day = day
+        self._active_today = set(active)
+
+    def record(self, user_id, game, stake, payout):
+        day = self._today()
+        if day != self._day:
+            self._day = day
+            self._active_today = set()
+        self._games[(day, game)].add(1, stake, payout)
+        self.supply += payout - stake
+        self._supply_delta += payout - stake
+        if user_id not in self._active_today:
+            self._active_today.add(user_id)
+            self._new_active.append((day, user_id))
+
+    async def days(self, count):
+        # Per-day, per-game totals for the last `count` local days, newest first, plus the
+        # number of active users on each of those days.
+        await self.accounts.flush()
+        start = self.day_clock.at(int(time.time())).day_start - (count - 1) * 24 * 60 * 60
+        games, active = await self.accounts.ledger.read(_days, start)
+        return [(day, game, GameDay(*totals)) for day, game, *totals in games], dict(active)
+
+    async def prune(self):
+        # Only today's membership is needed to count new active users; past days keep
+        # their count in economy_activity.
+        await self.accounts.flush()
+        return await self.accounts.ledger.run(_prune_active, self._today())
+
+    def _today(self):
+        return self.day_clock.at(int(time.time())).day_start
+
+    def _collect(self):
+        games = self._games
+        supply_delta = self._supply_delta
+        new_active = self._new_active
+        self._games = collections.defaultdict(GameDay)
+        self._supply_delta = 0
+        self._new_active = []
+
+        def restore():
+            for key, totals in games.items():
+                self._games[key].add(totals.rounds, totals.handle, totals.payout)
+            self._supply_delta += supply_delta
+            self._new_active[:0] = new_active
+
+        activity = collections.Counter(day for day, _ in new_active)
+        statements = [
+            ('''INSERT INTO economy_days (day, game, rounds, handle, payout) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (day, game) DO UPDATE SET rounds = rounds + excluded.rounds,
+                handle = handle + excluded.handle, payout = payout + excluded.payout''',
+             [(day, game, totals.rounds, totals.handle, totals.payout) for (day, game), totals in games.items()]),
+            ("UPDATE economy_totals SET value = value + ? WHERE name = 'supply'", [(supply_delta,)] if supply_delta else []),
+            ('INSERT OR IGNORE INTO economy_active (day, user_id) VALUES (?, ?)', new_active),
+            ('''INSERT INTO economy_activity (day, active_users) VALUES (?, ?)
+                ON CONFLICT (day) DO UPDATE SET active_users = active_users + excluded.active_users''',
+             list(activity.items())),
+        ]
+        return statements, restore
+
+
+def _load(conn, day):
+    # The starting supply is the one full scan, done the first time the table is used.
+    conn.execute('''
+        INSERT OR IGNORE INTO economy_totals (name, value)
+        SELECT 'supply', (SELECT COALESCE(SUM(balance), 0) FROM user_balance)
+                       + (SELECT COALESCE(SUM(amount), 0) FROM bet_reservations)
+    ''')
+    supply = conn.execute("SELECT value FROM economy_totals WHERE name = 'supply'").fetchone()[0]
+    active = [row[0] for row in conn.execute('SELECT user_id FROM economy_active WHERE day = ?', (day,))]
+    return supply, active
+
+
+def _days(conn, start):
+    games = conn.execute('''
+        SELECT day, game, rounds, handle, payout FROM economy_days WHERE day >= ? ORDER BY day DESC, game
+    ''', (start,)).fetchall()
+    active = conn.execute('SELECT day, active_users FROM economy_activity WHERE day >= ?', (start,)).fetchall()
+    return games, active
+
+
+def _prune_active(conn, day):
+    return conn.execute('DELETE FROM economy_active WHERE day < ?', (day,)).rowcount
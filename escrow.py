@@ -0,0 +1,126 @@
+import itertools
+import time
+from datetime import datetime
+
+
+class Reservation:
+    def __init__(self, reservation_id, user_id, amount, game):
+        self.id = reservation_id
+        self.user_id = user_id
+        self.amount = amount
+        self.game = game
+        self.created_at = datetime.now().isoformat()
+
+
+class Escrow:
+    # Chips for a bet are debited once, conditionally, when the game starts and credited
+    # back as the payout when it ends. Open reservations are written to bet_reservations
+    # in the same flush as the balance they were taken from, so a game that never settles
+    # (crash, restart) is refunded the next time the bot starts. A reservation opened and
+    # settled between two flushes never touches the table at all.
+
+    def __init__(self, accounts, transactions=None):
+        self.accounts = accounts
+        self.transactions = transactions
+        self._ids = itertools.count(1)
+        self._open = {}
+        self._unsaved = {}
+        self._settled = set()
+        accounts.add_flusher(self._collect)
+
+    @property
+    def open_count(self):
+        return len(self._open)
+
+    async def reserve(self, user_id, amount, game):
+        account = await self.accounts.get(user_id)
+        if account.balance < amount:
+            return None
+        self.accounts.adjust(account, -amount)
+        reservation = Reservation(next(self._ids), user_id, amount, game)
+        self._open[reservation.id] = reservation
+        self._unsaved[reservation.id] = reservation
+        return reservation
+
+    def new_game_id(self):
+        # For games settled without a reservation, like a run of autobet rounds.
+        return next(self._ids)
+
+    async def play_rounds(self, user_id, stake, payouts, game, game_id):
+        # Settles a run of equal bets in one go: rounds are taken in order for as long as
+        # the balance covers the stake, and only the net lands on the account. Nothing is
+        # left open, so there is nothing to refund after a crash. All the rounds share one
+        # game id. Returns the number of rounds played.
+        account = await self.accounts.get(user_id)
+        balance = account.balance
+        played = 0
+        for payout in payouts:
+            if balance < stake:
+                break
+            balance += payout - stake
+            played += 1
+        if played:
+            self.accounts.adjust(account, balance - account.balance)
+            if self.transactions is not None:
+                for payout in payouts[:played]:
+                    self.transactions.record(user_id, game, stake, payout, game_id)
+        return played
+
+    def get(self, reservation_id):
+        return self._open.get(reservation_id)
+
+    def has_open(self, user_id):
+        return any(reservation.user_id == user_id for reservation in self._open.values())
+
+    async def settle(self, reservation, payout):
+        account = await self.accounts.get(reservation.user_id)
+        if self._open.pop(reservation.id, None) is None:
+            return None
+        self.accounts.adjust(account, payout)
+        if self.transactions is not None:
+            self.transactions.record(reservation.user_id, reservation.game, reservation.amount, payout, reservation.id)
+        if self._unsaved.pop(reservation.id, None) is None:
+            self._settled.add(reservation.id)
+        return account.balance
+
+    async def refund_pending(self):
+        refunded, next_id = await self.accounts.ledger.run(_refund_pending)
+        self._ids = itertools.count(next_id)
+        return refunded
+
+    def _collect(self):
+        unsaved = self._unsaved
+        settled = self._settled
+        self._unsaved = {}
+        self._settled = set()
+
+        def restore():
+            for reservation_id, reservation in unsaved.items():
+                self._unsaved.setdefault(reservation_id, reservation)
+            self._settled.update(settled)
+
+        statements = [
+            ('INSERT INTO bet_reservations (id, user_id, amount, game, created_at) VALUES (?, ?, ?, ?, ?)',
+             [(r.id, r.user_id, r.amount, r.game, r.created_at) for r in unsaved.values()]),
+            ('DELETE FROM bet_reservations WHERE id = ?', [(reservation_id,) for reservation_id in settled]),
+        ]
+        return statements, restore
+
+
+def _refund_pending(conn):
+    pending = conn.execute('SELECT user_id, SUM(amount) FROM bet_reservations GROUP BY user_id').fetchall()
+    conn.executemany('UPDATE user_balance SET balance = balance + ? WHERE user_id = ?',
+                     [(amount, user_id) for user_id, amount in pending])
+    conn.execute('''
+        INSERT INTO transactions (user_id, game, stake, payout, created_at, game_id)
+        SELECT user_id, game, amount, amount, ?, id FROM bet_reservations
+    ''', (int(time.time()),))
+    refunded = conn.execute('DELETE FROM bet_reservations').rowcount
+    # Reservations settled between two flushes never reach bet_reservations, so the
+    # sequence alone can fall behind ids already used as transaction or fair bet game ids.
+    row = conn.execute('''
+        SELECT MAX(COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'bet_reservations'), 0),
+                   COALESCE((SELECT MAX(game_id) FROM transactions), 0),
+                   COALESCE((SELECT MAX(game_id) FROM fair_bets), 0))
+    ''').fetchone()
+    return refunded, row[0] + 1
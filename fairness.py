@@ -0,0 +1,356 @@
+import argparse
+import asyncio
+import collections
+import hashlib
+import hmac
+import itertools
+import json
+import os
+import random
+import struct
+import time
+
+from cards import Shoe
+from minesweeper import Board
+from payouts import coin_flip, dice_roll, rps_pick
+
+# Provably fair outcomes. Every user has a server seed, kept secret while in use but
+# published up front as its SHA-256 hash, a client seed they can pick, and a nonce that
+# counts their bets. A bet's random numbers are read from
+#
+#     HMAC-SHA256(key=server_seed, msg=f'{client_seed}:{nonce}:{counter}')
+#
+# for counter = 0, 1, 2, ... taken as big-endian 32-bit words. Once a seed is rotated
+# out its server seed is revealed, and anyone can check it against the published hash
+# and recompute every bet made with it.
+
+MAX_SEEDS = 10000
+MAX_BLOCK = 64
+# Nonces skipped for every seed still in use when the bank starts. Nonces handed out
+# since the last flush are lost in a crash, and reusing one would repeat an outcome the
+# player may already have seen.
+NONCE_GAP = 1000
+BLACKJACK_REPLAY_CARDS = 20
+
+
+def new_server_seed():
+    return os.urandom(32).hex()
+
+
+def new_client_seed():
+    return os.urandom(8).hex()
+
+
+def seed_hash(server_seed):
+    return hashlib.sha256(server_seed.encode()).hexdigest()
+
+
+class FairRandom:
+    # The random numbers for one bet. It has the parts of the random module's interface
+    # the games use, so it goes wherever they take an rng. Digests are computed in
+    # blocks that double in size as the bet keeps drawing, from 1 up to MAX_BLOCK, so a
+    # single coin flip costs one HMAC and a 1000-round autobet costs one key setup and a
+    # few dozen block refills instead of one hash per number.
+
+    def __init__(self, server_seed, client_seed, nonce):
+        self.client_seed = client_seed
+        self.nonce = nonce
+        self._mac = hmac.new(server_seed.encode(), digestmod=hashlib.sha256)
+        self._counter = 0
+        self._block = 1
+        self._words = ()
+        self._position = 0
+
+    def _refill(self):
+        prefix = f'{self.client_seed}:{self.nonce}:'.encode()
+        digests = []
+        for counter in range(self._counter, self._counter + self._block):
+            mac = self._mac.copy()
+            mac.update(prefix + str(counter).encode())
+            digests.append(mac.digest())
+        self._counter += self._block
+        self._words = struct.unpack(f'>{8 * self._block}I', b''.join(digests))
+        self._position = 0
+        self._block = min(self._block * 2, MAX_BLOCK)
+
+    def word(self):
+        if self._position == len(self._words):
+            self._refill()
+        word = self._words[self._position]
+        self._position += 1
+        return word
+
+    def getrandbits(self, k):
+        # Whole words, most significant first, with the excess low bits dropped.
+        words = (k + 31) // 32
+        value = 0
+        for _ in range(words):
+            value = value << 32 | self.word()
+        return value >> (words * 32 - k)
+
+    def random(self):
+        # 53 bits from two words, the same construction as the random module's.
+        return ((self.word() >> 5) * 67108864 + (self.word() >> 6)) / 9007199254740992
+
+    def randbelow(self, n):
+        # Rejection sampling rather than a modulo, so every result is equally likely.
+        k = n.bit_length()
+        value = self.getrandbits(k)
+        while value >= n:
+            value = self.getrandbits(k)
+        return value
+
+    def randrange(self, start, stop=None):
+        if stop is None:
+            start, stop = 0, start
+        return start + self.randbelow(stop - start)
+
+    def randint(self, a, b):
+        return a + self.randbelow(b - a + 1)
+
+    def choice(self, seq):
+        return seq[self.randbelow(len(seq))]
+
+    def uniform(self, a, b):
+        return a + (b - a) * self.random()
+
+    def sample(self, population, k):
+        # The first k steps of a Fisher-Yates shuffle.
+        pool = list(population)
+        for i in range(k):
+            j = i + self.randbelow(len(pool) - i)
+            pool[i], pool[j] = pool[j], pool[i]
+        return pool[:k]
+
+
+async def draw(bank, user_id, game, params, game_id=None):
+    # The game id and the rng for one bet. Pass the reservation id as game_id; games that
+    # settle without a reservation get a fresh id.
+    game_id, server_seed, client_seed, nonce = await bank.fair_draw(user_id, game, params, game_id)
+    return game_id, FairRandom(server_seed, client_seed, nonce)
+
+
+def replay(game, params, rng):
+    # A bet's outcome redone from its stream, drawn the same way the game drew it.
+    if game == 'dice':
+        return [dice_roll(rng) for _ in range(params[0])]
+    if game == 'coinflip':
+        return [coin_flip(rng) for _ in range(params[0])]
+    if game == 'rps':
+        return rps_pick(rng)
+    if game == 'minesweeper':
+        return Board.deal(params[0], rng).mines
+    if game == 'blackjack':
+        # How many cards a hand used isn't recorded, so this is the top of its shoe:
+        # the cards in the order they were dealt, as far as any hand gets.
+        shoe = Shoe(params[0], rng)
+        return [shoe.draw() for _ in range(BLACKJACK_REPLAY_CARDS)]
+    raise ValueError(f'No replay for {game}')
+
+
+class Seed:
+    __slots__ = ('id', 'user_id', 'server_seed', 'client_seed', 'nonce', 'created_at')
+
+    def __init__(self, seed_id, user_id, server_seed, client_seed, nonce, created_at):
+        self.id = seed_id
+        self.user_id = user_id
+        self.server_seed = server_seed
+        self.client_seed = client_seed
+        self.nonce = nonce
+        self.created_at = created_at
+
+    @property
+    def hash(self):
+        return seed_hash(self.server_seed)
+
+
+class Seeds:
+    # Each user's seed in use, cached like accounts: nonces advance in memory and are
+    # written back with the bets that used them in the next balance flush. Rotating a
+    # seed is the exception and is written straight through, since once a server seed is
+    # revealed it must never be used again, crash or not.
+
+    def __init__(self, accounts, max_seeds=MAX_SEEDS):
+        self.accounts = accounts
+        self.max_seeds = max_seeds
+        self._ids = None
+        self._seeds = collections.OrderedDict()
+        self._loading = {}
+        self._new = {}
+        self._advanced = {}
+        self._bets = []
+        accounts.add_flusher(self._collect)
+
+    def __len__(self):
+        return len(self._seeds)
+
+    async def start(self):
+        next_id = await self.accounts.ledger.run(_skip_nonces, NONCE_GAP)
+        self._ids = itertools.count(next_id)
+
+    async def get(self, user_id):
+        seed = self._seeds.get(user_id)
+        if seed is not None:
+            self._seeds.move_to_end(user_id)
+            return seed
+        loading = self._loading.get(user_id)
+        if loading is None:
+            loading = asyncio.ensure_future(self._load(user_id))
+            self._loading[user_id] = loading
+        return await asyncio.shield(loading)
+
+    async def _load(self, user_id):
+        try:
+            row = await self.accounts.ledger.read(_active_seed, user_id)
+        finally:
+            del self._loading[user_id]
+        if row is None:
+            seed = Seed(next(self._ids), user_id, new_server_seed(), new_client_seed(), 0, int(time.time()))
+            self._new[seed.id] = seed
+        else:
+            seed = Seed(*row)
+        self._seeds[user_id] = seed
+        return seed
+
+    async def draw(self, user_id, game_id, game, params):
+        seed = await self.get(user_id)
+        nonce = seed.nonce
+        seed.nonce += 1
+        self._advanced[seed.id] = seed
+        self._bets.append((game_id, seed.id, nonce, game, json.dumps(params)))
+        return seed, nonce
+
+    async def rotate(self, user_id, client_seed=None):
+        # Returns the seed taken out of use, now safe to show in full. The flush saves it
+        # and the bets made with it before it is marked revealed.
+        old = await self.get(user_id)
+        await self.accounts.flush()
+        now = int(time.time())
+        new = Seed(next(self._ids), user_id, new_server_seed(), client_seed or new_client_seed(), 0, now)
+        await self.accounts.ledger.run(_rotate, old.id, old.nonce, now,
+                                       (new.id, user_id, new.server_seed, new.client_seed, new.nonce, new.created_at))
+        self._new.pop(old.id, None)
+        self._advanced.pop(old.id, None)
+        self._seeds[user_id] = new
+        return old
+
+    async def bet(self, game_id):
+        await self.accounts.flush()
+        return await self.accounts.ledger.read(_bet, game_id)
+
+    def _collect(self):
+        self._evict()
+        new = self._new
+        advanced = self._advanced
+        bets = self._bets
+        self._new = {}
+        self._advanced = {}
+        self._bets = []
+
+        def restore():
+            for seed_id, seed in new.items():
+                self._new.setdefault(seed_id, seed)
+            for seed_id, seed in advanced.items():
+                self._advanced.setdefault(seed_id, seed)
+            self._bets[:0] = bets
+
+        statements = [
+            ('INSERT INTO fair_seeds (id, user_id, server_seed, client_seed, nonce, created_at) VALUES (?, ?, ?, ?, ?, ?)',
+             [(s.id, s.user_id, s.server_seed, s.client_seed, s.nonce, s.created_at) for s in new.values()]),
+            ('UPDATE fair_seeds SET nonce = MAX(nonce, ?) WHERE id = ?',
+             [(s.nonce, seed_id) for seed_id, s in advanced.items() if seed_id not in new]),
+            ('INSERT INTO fair_bets (game_id, seed_id, nonce, game, params) VALUES (?, ?, ?, ?, ?)', bets),
+        ]
+        return statements, restore
+
+    def _evict(self):
+        # Runs at the start of a flush, when every seed that is not new or advanced has
+        # been written by an earlier one, so a seed loaded again later has its last nonce.
+        excess = len(self._seeds) - self.max_seeds
+        if excess <= 0:
+            return
+        for user_id, seed in list(self._seeds.items())[:-1]:
+            if seed.id in self._new or seed.id in self._advanced:
+                continue
+            del self._seeds[user_id]
+            excess -= 1
+            if excess == 0:
+                return
+
+
+def _skip_nonces(conn, gap):
+    conn.execute('UPDATE fair_seeds SET nonce = nonce + ? WHERE revealed_at IS NULL', (gap,))
+    row = conn.execute('SELECT COALESCE(MAX(id), 0) FROM fair_seeds').fetchone()
+    return row[0] + 1
+
+
+def _active_seed(conn, user_id):
+    row = conn.execute('''
+        SELECT id, user_id, server_seed, client_seed, nonce, created_at FROM fair_seeds
+        WHERE user_id = ? AND revealed_at IS NULL ORDER BY id DESC LIMIT 1
+    ''', (user_id,)).fetchone()
+    return None if row is None else tuple(row)
+
+
+def _rotate(conn, seed_id, nonce, revealed_at, new_row):
+    conn.execute('UPDATE fair_seeds SET revealed_at = ?, nonce = MAX(nonce, ?) WHERE id = ?', (revealed_at, nonce, seed_id))
+    conn.execute('INSERT INTO fair_seeds (id, user_id, server_seed, client_seed, nonce, created_at) VALUES (?, ?, ?, ?, ?, ?)',
+                 new_row)
+
+
+def _bet(conn, game_id):
+    row = conn.execute('''
+        SELECT b.game, b.params, b.nonce, s.user_id, s.server_seed, s.client_seed, s.revealed_at,
+            b.compacted_rounds, b.compacted_stake, b.compacted_payout
+        FROM fair_bets b JOIN fair_seeds s ON s.id = b.seed_id WHERE b.game_id = ?
+    ''', (game_id,)).fetchone()
+    if row is None:
+        return None
+    totals = conn.execute('SELECT COUNT(*), COALESCE(SUM(stake), 0), COALESCE(SUM(payout), 0) FROM transactions '
+                          'WHERE game_id = ?', (game_id,)).fetchone()
+    row = tuple(row)
+    return row[:7] + tuple(raw + compacted for raw, compacted in zip(totals, row[7:]))
+
+
+def benchmark(count):
+    # Numbers per second for the distributions the games use, against the random module.
+    results = {}
+    for name, draw_one in (('word', lambda rng: rng.getrandbits(32)),
+                           ('randrange(3)', lambda rng: rng.randrange(3)),
+                           ('uniform', lambda rng: rng.uniform(0.01, 99.99)),
+                           ('sample(20, 3)', lambda rng: rng.sample(range(20), 3))):
+        # One long stream, as in an autobet run, and one fresh stream per number, as in
+        # single bets where each number pays for its own key setup.
+        rng = FairRandom(new_server_seed(), new_client_seed(), 0)
+        started = time.perf_counter()
+        for _ in range(count):
+            draw_one(rng)
+        streamed = count / (time.perf_counter() - started)
+
+        server_seed, client_seed = new_server_seed(), new_client_seed()
+        started = time.perf_counter()
+        for nonce in range(count):
+            draw_one(FairRandom(server_seed, client_seed, nonce))
+        per_bet = count / (time.perf_counter() - started)
+
+        rng = random.Random()
+        started = time.perf_counter()
+        for _ in range(count):
+            draw_one(rng)
+        baseline = count / (time.perf_counter() - started)
+        results[name] = (streamed, per_bet, baseline)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the provably fair random number streams')
+    parser.add_argument('--count', type=int, default=200_000)
+    args = parser.parse_args(argv)
+    print(f"{'':16}{'stream/s':>12}{'per bet/s':>12}{'random/s':>12}")
+    for name, (streamed, per_bet, baseline) in benchmark(args.count).items():
+        print(f'{name:16}{streamed:12,.0f}{per_bet:12,.0f}{baseline:12,.0f}')
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,124 @@
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+from launcher import LEDGER_SERVICE, wait_for_service
+from ledger_service import BankClient
+
+# Load test for the sharded setup. Stands up a ledger service on a scratch database and
+# several processes that act like shards: each hammers the same pool of users with
+# claims, bets and payouts through its own BankClient, many at a time. Afterwards the
+# database must balance: chips in accounts equal the tracked supply equal everything
+# ever paid in minus everything ever staked, and nobody is below zero.
+
+
+async def _player(bank, users, operations, rng, counts):
+    for _ in range(operations):
+        user_id = rng.choice(users)
+        if rng.random() < 0.1:
+            now = int(time.time())
+            claimed, _ = await bank.claim(user_id, 'hourly', 1000, now, now)
+            counts['claims'] += claimed
+            continue
+        stake = rng.randint(1, 200)
+        reservation = await bank.reserve(user_id, stake, 'dice')
+        if reservation is None:
+            counts['refused'] += 1
+            continue
+        await bank.settle(reservation, rng.choice((0, 0, stake, stake * 2)))
+        counts['bets'] += 1
+
+
+async def _shard(address, seed, users, players, operations):
+    bank = BankClient(address)
+    await bank.start()
+    rng = random.Random(seed)
+    counts = {'claims': 0, 'bets': 0, 'refused': 0}
+    try:
+        await asyncio.gather(*(_player(bank, users, operations, random.Random(rng.random()), counts)
+                               for _ in range(players)))
+    finally:
+        await bank.close()
+    counts['frames'] = bank.frames
+    counts['requests'] = bank.requests
+    return counts
+
+
+def _run_shard(address, seed, users, players, operations, results):
+    results.put(asyncio.run(_shard(address, seed, users, players, operations)))
+
+
+def check(path):
+    conn = sqlite3.connect(path)
+    balances, lowest, accounts = conn.execute('SELECT COALESCE(SUM(balance), 0), MIN(balance), COUNT(*) FROM user_balance').fetchone()
+    supply = conn.execute("SELECT value FROM economy_totals WHERE name = 'supply'").fetchone()[0]
+    net = conn.execute('SELECT COALESCE(SUM(payout - stake), 0) FROM transactions').fetchone()[0]
+    held = conn.execute('SELECT COUNT(*) FROM bet_reservations').fetchone()[0]
+    conn.close()
+
+    problems = []
+    if balances != supply:
+        problems.append(f'balances {balances} != supply {supply}')
+    if balances != net:
+        problems.append(f'balances {balances} != transaction total {net}')
+    if lowest is not None and lowest < 0:
+        problems.append(f'negative balance {lowest}')
+    if held:
+        problems.append(f'{held} bets left unsettled')
+    return accounts, balances, problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Drive a ledger service from several fake shard processes')
+    parser.add_argument('--shards', type=int, default=4, help='Shard processes')
+    parser.add_argument('--players', type=int, default=50, help='Concurrent players per shard')
+    parser.add_argument('--operations', type=int, default=200, help='Operations per player')
+    parser.add_argument('--users', type=int, default=100, help='Distinct users, shared by every shard')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as scratch:
+        path = os.path.join(scratch, 'ledger.db')
+        address = f"unix:{os.path.join(scratch, 'ledger.sock')}"
+        service = subprocess.Popen([sys.executable, LEDGER_SERVICE, '--address', address, '--db', path],
+                                   stdout=subprocess.DEVNULL)
+        try:
+            wait_for_service(address, service)
+            users = list(range(1, args.users + 1))
+            results = multiprocessing.Queue()
+            shards = [multiprocessing.Process(target=_run_shard,
+                                              args=(address, args.seed + index, users, args.players, args.operations, results))
+                      for index in range(args.shards)]
+            started = time.perf_counter()
+            for shard in shards:
+                shard.start()
+            counts = [results.get() for _ in shards]
+            elapsed = time.perf_counter() - started
+            for shard in shards:
+                shard.join()
+        finally:
+            service.terminate()
+            service.wait()
+
+        accounts, balances, problems = check(path)
+
+    totals = {key: sum(count[key] for count in counts) for key in counts[0]}
+    calls = totals['requests']
+    print(f"{args.shards} shards x {args.players} players: {totals['bets']} bets, {totals['claims']} claims, "
+          f"{totals['refused']} refused")
+    print(f"{calls} calls in {elapsed:.2f}s ({calls / elapsed:,.0f}/s), {calls / max(totals['frames'], 1):.1f} calls per frame")
+    print(f"{accounts} accounts holding {balances} chips")
+    for problem in problems:
+        print(problem)
+    return 1 if problems else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,47 @@
+import os
+import resource
+import sys
+
+import discord
+
+# How much of Discord's state the bot subscribes to and keeps. Commands only need
+# message content, so the minimal profile drops presences and members entirely: no
+# member lists are chunked at startup and no Member objects are cached, which is most of
+# the memory in large guilds. Names for the leaderboard come from UserNameCache instead.
+PROFILES = ('minimal', 'full')
+MESSAGE_CACHE = 200
+
+
+def client_options(profile='minimal', max_messages=MESSAGE_CACHE):
+    if profile not in PROFILES:
+        raise ValueError(f'Unknown gateway profile: {profile}')
+    if profile == 'full':
+        return {
+            'intents': discord.Intents.all(),
+            'max_messages': max_messages,
+        }
+
+    intents = discord.Intents.none()
+    intents.guilds = True
+    intents.messages = True
+    intents.message_content = True
+    intents.reactions = True
+    return {
+        'intents': intents,
+        'member_cache_flags': discord.MemberCacheFlags.none(),
+        'chunk_guilds_at_startup': False,
+        'max_messages': max_messages,
+    }
+
+
+def memory_usage():
+    # (current, peak) resident set size in bytes; current is None where /proc is missing.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform != 'darwin':
+        peak *= 1024
+    try:
+        with open('/proc/self/statm') as f:
+            current = int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        current = None
+    return current, peak
@@ -0,0 +1,85 @@
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+from ledger_service import DEFAULT_ADDRESS, parse_address
+
+# The child scripts sit next to this one, wherever it is run from.
+HERE = os.path.dirname(os.path.abspath(__file__))
+LEDGER_SERVICE = os.path.join(HERE, 'ledger_service.py')
+BOT = os.path.join(HERE, 'discordBot.py')
+
+# Runs the casino as several processes on one machine: a ledger service that owns the
+# database, and bot processes that each connect a slice of the gateway shards. Any bot
+# process can then take bets from any user, since balances only live in the service.
+
+CONNECT_TIMEOUT = 10.0
+
+
+async def _reachable(address):
+    kind, target = parse_address(address)
+    try:
+        if kind == 'unix':
+            _, writer = await asyncio.open_unix_connection(target)
+        else:
+            _, writer = await asyncio.open_connection(*target)
+    except OSError:
+        return False
+    writer.close()
+    return True
+
+
+def wait_for_service(address, process, timeout=CONNECT_TIMEOUT):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'Ledger service exited with code {process.returncode}')
+        if asyncio.run(_reachable(address)):
+            return
+        time.sleep(0.1)
+    raise RuntimeError(f'Ledger service did not come up on {address}')
+
+
+def shard_slices(shard_count, processes):
+    # Spreads shard ids 0..shard_count-1 over the processes as evenly as possible.
+    return [list(range(shard_count))[index::processes] for index in range(processes) if index < shard_count]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Start the ledger service and the bot shards')
+    parser.add_argument('--shard-count', type=int, default=int(os.getenv('SHARD_COUNT', 1)))
+    parser.add_argument('--processes', type=int, default=int(os.getenv('SHARD_PROCESSES', os.cpu_count() or 1)),
+                        help='Bot processes to spread the shards over')
+    parser.add_argument('--address', default=os.getenv('LEDGER_ADDRESS', DEFAULT_ADDRESS))
+    parser.add_argument('--db', default=os.getenv('DATABASE_PATH', 'user_data.db'))
+    args = parser.parse_args(argv)
+
+    service = subprocess.Popen([sys.executable, LEDGER_SERVICE, '--address', args.address, '--db', args.db])
+    bots = []
+    try:
+        wait_for_service(args.address, service)
+        for shard_ids in shard_slices(args.shard_count, args.processes):
+            print(f'Starting shards {shard_ids} of {args.shard_count}')
+            bots.append(subprocess.Popen([sys.executable, BOT, '--ledger', args.address,
+                                          '--shard-count', str(args.shard_count),
+                                          '--shard-ids', *map(str, shard_ids)]))
+        while all(bot.poll() is None for bot in bots) and service.poll() is None:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        # Bots first, so their last bets reach the service before it flushes and exits.
+        for bot in bots:
+            bot.terminate()
+        for bot in bots:
+            bot.wait()
+        service.terminate()
+        service.wait()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,386 @@
+import asyncio
+import concurrent.futures
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+COMMIT_WINDOW = 0.005
+MAX_BATCH = 512
+READERS = 2
+
+USER_COLUMNS = ('balance', 'bet_amount', 'daily_claimed_at', 'hourly_claimed_at')
+CLAIM_COLUMNS = ('daily_claimed_at', 'hourly_claimed_at')
+SCHEMA_VERSION = 2
+
+
+def create_schema(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS user_balance (
+            user_id INTEGER PRIMARY KEY,
+            balance INTEGER DEFAULT 0,
+            bet_amount INTEGER DEFAULT 0,
+            daily_claimed_at INTEGER NOT NULL DEFAULT 0,
+            hourly_claimed_at INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_user_balance_balance ON user_balance (balance)')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS bet_reservations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            amount INTEGER NOT NULL,
+            game TEXT NOT NULL,
+            created_at TEXT NOT NULL
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS transactions (
+            id INTEGER PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            game TEXT NOT NULL,
+            stake INTEGER NOT NULL,
+            payout INTEGER NOT NULL,
+            created_at INTEGER NOT NULL,
+            game_id INTEGER
+        )
+    ''')
+    # Covering indexes: .history reads only the first, per-game reports only the second.
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_transactions_user ON transactions (user_id, id, game, stake, payout, created_at, game_id)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_transactions_game ON transactions (game, created_at, stake, payout)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_transactions_game_id ON transactions (game_id)')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS transaction_days (
+            game TEXT NOT NULL,
+            day INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            rounds INTEGER NOT NULL,
+            stake INTEGER NOT NULL,
+            payout INTEGER NOT NULL,
+            PRIMARY KEY (game, day, user_id)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS economy_totals (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS economy_days (
+            day INTEGER NOT NULL,
+            game TEXT NOT NULL,
+            rounds INTEGER NOT NULL,
+            handle INTEGER NOT NULL,
+            payout INTEGER NOT NULL,
+            PRIMARY KEY (day, game)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS economy_activity (
+            day INTEGER PRIMARY KEY,
+            active_users INTEGER NOT NULL
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS economy_active (
+            day INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            PRIMARY KEY (day, user_id)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS guild_settings (
+            guild_id INTEGER PRIMARY KEY,
+            timezone TEXT NOT NULL
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS fair_seeds (
+            id INTEGER PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            server_seed TEXT NOT NULL,
+            client_seed TEXT NOT NULL,
+            nonce INTEGER NOT NULL,
+            created_at INTEGER NOT NULL,
+            revealed_at INTEGER
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_fair_seeds_user ON fair_seeds (user_id, revealed_at)')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS fair_bets (
+            game_id INTEGER PRIMARY KEY,
+            seed_id INTEGER NOT NULL,
+            nonce INTEGER NOT NULL,
+            game TEXT NOT NULL,
+            params TEXT NOT NULL,
+            compacted_rounds INTEGER NOT NULL DEFAULT 0,
+            compacted_stake INTEGER NOT NULL DEFAULT 0,
+            compacted_payout INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+
+
+def migrate(conn):
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+    if version < 1:
+        _migrate_epoch_claims(conn)
+    if version < 2:
+        _migrate_fair_bet_totals(conn)
+    conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+
+
+def _migrate_epoch_claims(conn):
+    # Claim times used to be str(datetime) text, some naive (server local time) and some
+    # timezone-aware. They become epoch seconds, parsed once here instead of per claim.
+    columns = {row['name'] for row in conn.execute('PRAGMA table_info(user_balance)')}
+    if 'daily_last_claimed' not in columns:
+        return
+    conn.execute('BEGIN')
+    conn.execute('ALTER TABLE user_balance ADD COLUMN daily_claimed_at INTEGER NOT NULL DEFAULT 0')
+    conn.execute('ALTER TABLE user_balance ADD COLUMN hourly_claimed_at INTEGER NOT NULL DEFAULT 0')
+    rows = conn.execute('SELECT user_id, daily_last_claimed, hourly_last_claimed FROM user_balance').fetchall()
+    conn.executemany('UPDATE user_balance SET daily_claimed_at = ?, hourly_claimed_at = ? WHERE user_id = ?',
+                     [(_epoch(daily), _epoch(hourly), user_id) for user_id, daily, hourly in rows])
+    conn.execute('ALTER TABLE user_balance DROP COLUMN daily_last_claimed')
+    conn.execute('ALTER TABLE user_balance DROP COLUMN hourly_last_claimed')
+    conn.execute('COMMIT')
+
+
+def _migrate_fair_bet_totals(conn):
+    # Compaction keeps the totals of provably fair games on their fair_bets row, so
+    # .verify can still show what was staked and paid after the rounds are gone.
+    columns = {row['name'] for row in conn.execute('PRAGMA table_info(fair_bets)')}
+    if not columns or 'compacted_rounds' in columns:
+        return
+    conn.execute('BEGIN')
+    for column in ('compacted_rounds', 'compacted_stake', 'compacted_payout'):
+        conn.execute(f'ALTER TABLE fair_bets ADD COLUMN {column} INTEGER NOT NULL DEFAULT 0')
+    conn.execute('COMMIT')
+
+
+def _epoch(value):
+    if not value:
+        return 0
+    return int(datetime.fromisoformat(value).timestamp())
+
+
+def ensure_user(conn, user_id):
+    conn.execute('INSERT OR IGNORE INTO user_balance (user_id) VALUES (?)', (user_id,))
+
+
+class Ledger:
+    # Owns the user_balance connection on a single writer thread. Operations are queued
+    # from the event loop and every operation that arrives within one commit window shares
+    # a single transaction, so a burst of bets costs one fsync instead of one per bet.
+    # Read-only queries go to a small pool of reader threads with a connection each; WAL
+    # lets them run alongside the writer and each other.
+
+    def __init__(self, path, commit_window=COMMIT_WINDOW, max_batch=MAX_BATCH, readers=READERS):
+        self.path = path
+        self.commit_window = commit_window
+        self.max_batch = max_batch
+        self.commits = 0
+        self.operations = 0
+        self.reads = 0
+        # Optional timing(seconds, statement) callback, called on the ledger's threads.
+        self.timing = None
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._ready = threading.Event()
+        self._startup_error = None
+        self._readers = concurrent.futures.ThreadPoolExecutor(max_workers=readers, thread_name_prefix='ledger-reader')
+        self._reader_local = threading.local()
+        self._reader_conns = []
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name='ledger-writer', daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        if self._startup_error is not None:
+            raise self._startup_error
+
+    def close(self):
+        if self._thread is None:
+            return
+        self._readers.shutdown()
+        for conn in self._reader_conns:
+            conn.close()
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+
+    def submit(self, fn, *args):
+        future = concurrent.futures.Future()
+        self._queue.put((fn, args, future))
+        return future
+
+    def run(self, fn, *args):
+        return asyncio.wrap_future(self.submit(fn, *args))
+
+    def read(self, fn, *args):
+        # Sees everything committed before it starts, i.e. every awaited run() or flush.
+        return asyncio.wrap_future(self._readers.submit(self._read, fn, args))
+
+    async def execute(self, sql, params=()):
+        return await self.run(lambda conn: conn.execute(sql, params).rowcount)
+
+    async def executemany(self, sql, rows):
+        return await self.run(lambda conn: conn.executemany(sql, rows).rowcount)
+
+    async def fetchone(self, sql, params=()):
+        return await self.read(lambda conn: conn.execute(sql, params).fetchone())
+
+    async def fetchall(self, sql, params=()):
+        return await self.read(lambda conn: conn.execute(sql, params).fetchall())
+
+    async def get_user(self, user_id):
+        return await self.run(_get_user, user_id)
+
+    async def get_balance(self, user_id):
+        row = await self.run(_get_user, user_id)
+        return row['balance']
+
+    async def apply_delta(self, user_id, delta, **columns):
+        for column in columns:
+            if column not in USER_COLUMNS:
+                raise ValueError(f"Unknown user_balance column: {column}")
+        return await self.run(_apply_delta, user_id, delta, columns)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        migrate(conn)
+        create_schema(conn)
+        return conn
+
+    def _read(self, fn, args):
+        conn = getattr(self._reader_local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA query_only = ON')
+            self._reader_local.conn = conn
+            self._reader_conns.append(conn)
+        self.reads += 1
+        if self.timing is None:
+            return fn(conn, *args)
+        started = time.perf_counter()
+        try:
+            return fn(conn, *args)
+        finally:
+            self.timing(time.perf_counter() - started, _statement_name(fn))
+
+    def _run(self):
+        try:
+            conn = self._connect()
+        except Exception as e:
+            self._startup_error = e
+            self._ready.set()
+            return
+        self._ready.set()
+
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is None:
+                break
+
+            results = []
+            deadline = time.monotonic() + self.commit_window
+            conn.execute('BEGIN')
+            while item is not None:
+                results.append(self._apply(conn, item))
+                if len(results) >= self.max_batch:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    timeout = deadline - time.monotonic()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = self._queue.get(timeout=timeout)
+                    except queue.Empty:
+                        break
+                if item is None:
+                    stopping = True
+
+            try:
+                started = time.perf_counter()
+                conn.execute('COMMIT')
+                if self.timing is not None:
+                    self.timing(time.perf_counter() - started, 'commit')
+            except Exception as e:
+                conn.execute('ROLLBACK')
+                for future, _, _ in results:
+                    future.set_exception(e)
+                continue
+
+            self.commits += 1
+            self.operations += len(results)
+            for future, result, error in results:
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(result)
+
+        conn.close()
+
+    def _apply(self, conn, item):
+        fn, args, future = item
+        conn.execute('SAVEPOINT op')
+        started = time.perf_counter()
+        try:
+            result = fn(conn, *args)
+        except Exception as e:
+            conn.execute('ROLLBACK TO op')
+            conn.execute('RELEASE op')
+            return future, None, e
+        finally:
+            if self.timing is not None:
+                self.timing(time.perf_counter() - started, _statement_name(fn))
+        conn.execute('RELEASE op')
+        return future, result, None
+
+
+def _statement_name(fn):
+    # execute/fetchone/fetchall wrap raw SQL in lambdas; everything else is a named function.
+    name = fn.__name__.strip('_')
+    return 'sql' if name == '<lambda>' else name
+
+
+def _get_user(conn, user_id):
+    ensure_user(conn, user_id)
+    return conn.execute('SELECT * FROM user_balance WHERE user_id = ?', (user_id,)).fetchone()
+
+
+def _apply_delta(conn, user_id, delta, columns):
+    ensure_user(conn, user_id)
+    assignments = ''.join(f', {column} = ?' for column in columns)
+    row = conn.execute(f'UPDATE user_balance SET balance = balance + ?{assignments} WHERE user_id = ? RETURNING balance',
+                       (delta, *columns.values(), user_id)).fetchone()
+    return row['balance']
+
+
+def claim_reward(conn, column, user_id, chips, now, cutoff):
+    # Credits the claim and stamps its time only if the last claim was at or before cutoff,
+    # creating the user if needed. Returns (claimed, claimed_at).
+    if column not in CLAIM_COLUMNS:
+        raise ValueError(f"Unknown claim column: {column}")
+    row = conn.execute(f'''
+        INSERT INTO user_balance (user_id, balance, {column}) VALUES (?, ?, ?)
+        ON CONFLICT (user_id) DO UPDATE SET balance = balance + excluded.balance, {column} = excluded.{column}
+        WHERE user_balance.{column} <= ?
+        RETURNING balance
+    ''', (user_id, chips, now, cutoff)).fetchone()
+    if row is not None:
+        conn.execute('INSERT INTO transactions (user_id, game, stake, payout, created_at) VALUES (?, ?, 0, ?, ?)',
+                     (user_id, column.removesuffix('_claimed_at'), chips, now))
+        return True, now
+    return False, conn.execute(f'SELECT {column} FROM user_balance WHERE user_id = ?', (user_id,)).fetchone()[0]
@@ -0,0 +1,261 @@
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import signal
+import struct
+
+from bank import REMOTE_METHODS, Bank
+
+# Shards and the ledger service speak length-prefixed JSON frames over a Unix socket or
+# local TCP. A frame from a shard is a list of [id, method, args] requests and a frame back
+# is a list of [id, error, result] responses, so many calls share one write each way and
+# a shard never waits for one answer before sending the next request.
+HEADER = struct.Struct('>I')
+DEFAULT_ADDRESS = 'unix:casino-ledger.sock'
+
+
+class BankError(Exception):
+    pass
+
+
+def _encode(items):
+    payload = json.dumps(items, separators=(',', ':')).encode()
+    return HEADER.pack(len(payload)) + payload
+
+
+async def _read_frame(reader):
+    try:
+        header = await reader.readexactly(HEADER.size)
+        payload = await reader.readexactly(HEADER.unpack(header)[0])
+    except asyncio.IncompleteReadError:
+        return None
+    return json.loads(payload)
+
+
+def parse_address(address):
+    # 'unix:/path/to.sock' or 'host:port'.
+    if address.startswith('unix:'):
+        return 'unix', address[len('unix:'):]
+    host, _, port = address.rpartition(':')
+    return 'tcp', (host or '127.0.0.1', int(port))
+
+
+class Batcher:
+    # Collects items queued during one pass of the event loop and writes them as one frame.
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.frames = 0
+        self._items = []
+        self._scheduled = False
+
+    def add(self, item):
+        self._items.append(item)
+        if not self._scheduled:
+            self._scheduled = True
+            asyncio.get_running_loop().call_soon(self._flush)
+
+    def _flush(self):
+        self._scheduled = False
+        items = self._items
+        self._items = []
+        if items and not self.writer.is_closing():
+            self.writer.write(_encode(items))
+            self.frames += 1
+
+
+class LedgerService:
+    def __init__(self, bank):
+        self.bank = bank
+        self.requests = 0
+        self.frames = 0
+        self.connections = 0
+
+    async def serve(self, address):
+        kind, target = parse_address(address)
+        if kind == 'unix':
+            if os.path.exists(target):
+                os.unlink(target)
+            return await asyncio.start_unix_server(self._connection, path=target)
+        return await asyncio.start_server(self._connection, *target)
+
+    async def _connection(self, reader, writer):
+        self.connections += 1
+        responses = Batcher(writer)
+        tasks = set()
+        try:
+            while True:
+                requests = await _read_frame(reader)
+                if requests is None:
+                    break
+                self.frames += 1
+                for request_id, method, args in requests:
+                    self.requests += 1
+                    task = asyncio.ensure_future(self._handle(responses, request_id, method, args))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+        finally:
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+            self.connections -= 1
+            writer.close()
+
+    async def _handle(self, responses, request_id, method, args):
+        if method not in REMOTE_METHODS:
+            responses.add([request_id, f"Unknown method: {method}", None])
+            return
+        try:
+            result = await getattr(self.bank, method)(*args)
+        except Exception as e:
+            responses.add([request_id, repr(e), None])
+            return
+        responses.add([request_id, None, result])
+
+
+class BankClient:
+    # Stands in for Bank inside a shard. Calls made in the same event loop pass are sent
+    # together and any number can be outstanding; answers are matched back by id.
+
+    def __init__(self, address):
+        self.address = address
+        self.requests = 0
+        # Optional timing(seconds, method) callback for round trips to the service.
+        self.timing = None
+        self._ids = itertools.count(1)
+        self._pending = {}
+        self._writer = None
+        self._requests = None
+        self._connecting = None
+        self._read_task = None
+
+    @property
+    def frames(self):
+        return self._requests.frames if self._requests is not None else 0
+
+    async def start(self):
+        await self._connect()
+        return 0
+
+    async def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    async def _connect(self):
+        if self._writer is not None:
+            return
+        if self._connecting is None:
+            self._connecting = asyncio.ensure_future(self._open())
+        try:
+            await asyncio.shield(self._connecting)
+        finally:
+            self._connecting = None
+
+    async def _open(self):
+        kind, target = parse_address(self.address)
+        if kind == 'unix':
+            reader, writer = await asyncio.open_unix_connection(target)
+        else:
+            reader, writer = await asyncio.open_connection(*target)
+        self._writer = writer
+        self._requests = Batcher(writer)
+        self._read_task = asyncio.ensure_future(self._read_responses(reader))
+
+    async def _read_responses(self, reader):
+        try:
+            while True:
+                responses = await _read_frame(reader)
+                if responses is None:
+                    break
+                for request_id, error, result in responses:
+                    future = self._pending.pop(request_id, None)
+                    if future is None or future.done():
+                        continue
+                    if error is not None:
+                        future.set_exception(BankError(error))
+                    else:
+                        future.set_result(result)
+        finally:
+            self._writer = None
+            pending = self._pending
+            self._pending = {}
+            for future in pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError('Lost connection to the ledger service'))
+
+    async def call(self, method, *args):
+        if self._writer is None:
+            await self._connect()
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        request_id = next(self._ids)
+        self._pending[request_id] = future
+        self._requests.add([request_id, method, args])
+        self.requests += 1
+        if self.timing is None:
+            return await future
+        started = loop.time()
+        try:
+            return await future
+        finally:
+            self.timing(loop.time() - started, method)
+
+
+def _remote(method):
+    async def call(self, *args):
+        return await self.call(method, *args)
+    call.__name__ = method
+    return call
+
+
+for _method in REMOTE_METHODS:
+    setattr(BankClient, _method, _remote(_method))
+
+
+async def _midnight_loop(bank, retention_days):
+    clock = bank.economy.day_clock
+    while True:
+        day_start = await clock.wait_for_midnight()
+        compacted = await bank.end_of_day(day_start, retention_days)
+        if compacted:
+            print(f'Compacted {compacted} transactions into daily totals')
+
+
+async def run(address, path, timezone, retention_days):
+    bank = Bank(path, timezone)
+    refunded = await bank.start()
+    if refunded:
+        print(f'Refunded {refunded} unsettled bets')
+    service = LedgerService(bank)
+    server = await service.serve(address)
+    midnight = asyncio.ensure_future(_midnight_loop(bank, retention_days))
+    # The launcher stops the service with SIGTERM; the cached balances still get flushed.
+    stopping = asyncio.Event()
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stopping.set)
+    print(f'Ledger service listening on {address}')
+    try:
+        async with server:
+            await stopping.wait()
+    finally:
+        midnight.cancel()
+        await bank.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Own the casino database and serve balances to bot shards')
+    parser.add_argument('--address', default=os.getenv('LEDGER_ADDRESS', DEFAULT_ADDRESS),
+                        help="'unix:/path.sock' or 'host:port'")
+    parser.add_argument('--db', default=os.getenv('DATABASE_PATH', 'user_data.db'))
+    parser.add_argument('--timezone', default=os.getenv('CASINO_TIMEZONE', 'America/New_York'))
+    parser.add_argument('--retention-days', type=int, default=int(os.getenv('TRANSACTION_RETENTION_DAYS', 90)))
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(run(args.address, args.db, args.timezone, args.retention_days))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
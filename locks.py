@@ -0,0 +1,55 @@
+import asyncio
+import contextlib
+import time
+import weakref
+
+
+class UserLocks:
+    # One asyncio.Lock per user, created on demand and dropped as soon as nobody holds or
+    # waits on it, so idle users cost nothing. Operations that touch several users take
+    # their locks in ascending user id order, which rules out two of them deadlocking on
+    # each other. The locks only cover one process: with shards in several processes, one
+    # user's commands can run at once on different shards, and it is the ledger service
+    # applying every balance change in turn that keeps those consistent.
+
+    def __init__(self):
+        self.acquisitions = 0
+        self.contended = 0
+        self.wait_time = 0.0
+        self.max_wait = 0.0
+        self._locks = weakref.WeakValueDictionary()
+
+    def __len__(self):
+        return len(self._locks)
+
+    def locked(self, user_id):
+        lock = self._locks.get(user_id)
+        return lock is not None and lock.locked()
+
+    def _lock(self, user_id):
+        lock = self._locks.get(user_id)
+        if lock is None:
+            lock = self._locks[user_id] = asyncio.Lock()
+        return lock
+
+    @contextlib.asynccontextmanager
+    async def hold(self, *user_ids):
+        locks = [self._lock(user_id) for user_id in sorted(set(user_ids))]
+        acquired = []
+        try:
+            for lock in locks:
+                self.acquisitions += 1
+                if lock.locked():
+                    self.contended += 1
+                    started = time.perf_counter()
+                    await lock.acquire()
+                    waited = time.perf_counter() - started
+                    self.wait_time += waited
+                    self.max_wait = max(self.max_wait, waited)
+                else:
+                    await lock.acquire()
+                acquired.append(lock)
+            yield
+        finally:
+            for lock in reversed(acquired):
+                lock.release()
@@ -0,0 +1,185 @@
+import asyncio
+import bisect
+import collections
+import threading
+
+import aiohttp
+from aiohttp import web
+
+# Seconds; anything slower than the last bound lands in +Inf.
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LAG_INTERVAL = 0.25
+
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'count', 'sum', 'max')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        # Upper bound of the bucket holding the q-th observation, capped at the largest
+        # value seen, so it never reads lower than the truth by more than one bucket.
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+
+class Metrics:
+    # In-process counters, gauges and latency histograms, rendered in the Prometheus text
+    # format. Histograms may be fed from the ledger's threads as well as the event loop,
+    # hence the lock; gauges are read from callbacks only when someone asks.
+
+    def __init__(self, namespace='casino'):
+        self.namespace = namespace
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+        self._gauges = {}
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self._histograms[name] = (help, labels, buckets, {})
+
+    def counter(self, name, help, labels=()):
+        self._counters[name] = (help, labels, collections.Counter())
+
+    def gauge(self, name, help, read):
+        self._gauges[name] = (help, read)
+
+    def observe(self, name, value, *labels):
+        _, _, buckets, series = self._histograms[name]
+        with self._lock:
+            histogram = series.get(labels)
+            if histogram is None:
+                histogram = series[labels] = Histogram(buckets)
+            histogram.observe(value)
+
+    def inc(self, name, *labels, amount=1):
+        with self._lock:
+            self._counters[name][2][labels] += amount
+
+    def timer(self, name):
+        # A callback(value, *labels) for code that should not know about Metrics.
+        def observe(value, *labels):
+            self.observe(name, value, *labels)
+        return observe
+
+    def series(self, name):
+        return dict(self._histograms[name][3])
+
+    def counts(self, name):
+        return dict(self._counters[name][2])
+
+    def render(self):
+        lines = []
+        with self._lock:
+            for name, (help, labels, buckets, series) in self._histograms.items():
+                full = f'{self.namespace}_{name}'
+                lines.append(f'# HELP {full} {help}')
+                lines.append(f'# TYPE {full} histogram')
+                for values, histogram in series.items():
+                    cumulative = 0
+                    for bound, count in zip(buckets + (float('inf'),), histogram.counts):
+                        cumulative += count
+                        le = '+Inf' if bound == float('inf') else repr(bound)
+                        lines.append(f'{full}_bucket{_labels(labels, values, le=le)} {cumulative}')
+                    lines.append(f'{full}_sum{_labels(labels, values)} {histogram.sum}')
+                    lines.append(f'{full}_count{_labels(labels, values)} {histogram.count}')
+            for name, (help, labels, counts) in self._counters.items():
+                full = f'{self.namespace}_{name}'
+                lines.append(f'# HELP {full} {help}')
+                lines.append(f'# TYPE {full} counter')
+                for values, count in counts.items():
+                    lines.append(f'{full}{_labels(labels, values)} {count}')
+        for name, (help, read) in self._gauges.items():
+            full = f'{self.namespace}_{name}'
+            lines.append(f'# HELP {full} {help}')
+            lines.append(f'# TYPE {full} gauge')
+            lines.append(f'{full} {read()}')
+        return '\n'.join(lines) + '\n'
+
+    def trace_config(self, name, errors):
+        # Times every aiohttp request made through a session built with this config,
+        # e.g. discord.py's REST client via Client(http_trace=...).
+        trace = aiohttp.TraceConfig()
+
+        async def on_request_start(session, context, params):
+            context.started = asyncio.get_running_loop().time()
+
+        async def on_request_end(session, context, params):
+            elapsed = asyncio.get_running_loop().time() - context.started
+            self.observe(name, elapsed, params.method, params.url.host or '')
+
+        async def on_request_exception(session, context, params):
+            self.inc(errors, params.method, params.url.host or '')
+
+        trace.on_request_start.append(on_request_start)
+        trace.on_request_end.append(on_request_end)
+        trace.on_request_exception.append(on_request_exception)
+        return trace
+
+    async def serve(self, host, port):
+        async def handle(request):
+            return web.Response(text=self.render(), content_type='text/plain', charset='utf-8')
+
+        app = web.Application()
+        app.router.add_get('/metrics', handle)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, host, port).start()
+        return runner
+
+
+def _labels(names, values, **extra):
+    pairs = list(zip(names, values)) + list(extra.items())
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class LoopLag:
+    # Sleeps a fixed interval and records how late it woke up. Anything blocking the
+    # event loop, such as a slow synchronous call in a command, shows up here.
+
+    def __init__(self, metrics, name, interval=LAG_INTERVAL):
+        self.metrics = metrics
+        self.name = name
+        self.interval = interval
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            self.metrics.observe(self.name, max(loop.time() - started - self.interval, 0.0))
@@ -0,0 +1,64 @@
+import math
+import random
+from fractions import Fraction
+
+# A board is two ints: bit (row * COLUMNS + column) of `mines` and `revealed` is that
+# cell. Reveals and the win check are bitwise on whole boards, so a game in progress
+# costs a few dozen bytes and no per-cell objects.
+# The size is what fits in a message: 4 rows of 5 buttons plus a row of controls.
+ROWS = 4
+COLUMNS = 5
+CELLS = ROWS * COLUMNS
+FULL = (1 << CELLS) - 1
+MINES = 3
+# Taken off every cash out after at least one pick. Cells show no mine counts and open
+# one at a time, so every pick is blind and the price below is exact without it.
+EDGE = Fraction(3, 100)
+
+
+def _multipliers(mines):
+    # The fair price of k safe picks in a row: the inverse of the chance that k cells
+    # picked blind out of CELLS all miss the mines, C(CELLS - mines, k) / C(CELLS, k),
+    # less the edge. No picks is a refund.
+    return (Fraction(1),) + tuple(Fraction(math.comb(CELLS, k), math.comb(CELLS - mines, k)) * (1 - EDGE)
+                                  for k in range(1, CELLS - mines + 1))
+
+
+MULTIPLIERS = tuple(_multipliers(mines) if mines else () for mines in range(CELLS))
+
+
+def multiplier(mines, picks):
+    return MULTIPLIERS[mines][picks]
+
+
+def payout(bet_amount, mines, picks):
+    # Rounded down, so small bets can't round the edge away.
+    return math.floor(bet_amount * MULTIPLIERS[mines][picks])
+
+
+class Board:
+    __slots__ = ('mines', 'revealed')
+
+    def __init__(self, mines, revealed=0):
+        self.mines = mines
+        self.revealed = revealed
+
+    @classmethod
+    def deal(cls, mines=MINES, rng=random):
+        return cls(sum(1 << cell for cell in rng.sample(range(CELLS), mines)))
+
+    def is_revealed(self, cell):
+        return bool(self.revealed >> cell & 1)
+
+    def is_mine(self, cell):
+        return bool(self.mines >> cell & 1)
+
+    @property
+    def cleared(self):
+        return self.revealed | self.mines == FULL
+
+    def reveal(self, cell):
+        # Opens the cell. Returns False if it was a mine.
+        bit = 1 << cell
+        self.revealed |= bit
+        return not self.mines & bit
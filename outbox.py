@@ -0,0 +1,184 @@
+import asyncio
+import collections
+import logging
+import time
+
+import discord
+
+# Discord allows roughly 5 message creates and 5 edits per 5 seconds in a channel.
+BUCKET_LIMIT = 5
+BUCKET_PERIOD = 5.0
+
+log = logging.getLogger('casino')
+
+
+class Bucket:
+    # Token bucket for one route, e.g. ('edit', channel_id). Callers wait for a token
+    # instead of sending and getting a 429 back.
+
+    def __init__(self, limit=BUCKET_LIMIT, period=BUCKET_PERIOD):
+        self.limit = limit
+        self.period = period
+        self.tokens = float(limit)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def delay(self):
+        now = time.monotonic()
+        self.tokens = min(self.limit, self.tokens + (now - self.updated) * self.limit / self.period)
+        self.updated = now
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) * self.period / self.limit
+
+    def take(self):
+        self.tokens -= 1
+
+    def block(self, retry_after):
+        self.tokens = 0.0
+        self.blocked_until = time.monotonic() + retry_after
+
+
+class Operation:
+    __slots__ = ('kind', 'target', 'kwargs', 'future')
+
+    def __init__(self, kind, target, kwargs):
+        self.kind = kind
+        self.target = target
+        self.kwargs = kwargs
+        self.future = asyncio.get_running_loop().create_future()
+
+
+class Outbox:
+    # Per-channel queue for message sends and edits. Each channel is drained in order by
+    # one task that only exists while the queue is non-empty. An edit to a message that
+    # already has an edit waiting is merged into it, so a burst of updates to one game
+    # message becomes a single request carrying the latest state.
+
+    def __init__(self, limit=BUCKET_LIMIT, period=BUCKET_PERIOD):
+        self.limit = limit
+        self.period = period
+        self.sent = 0
+        self.edited = 0
+        self.coalesced = 0
+        self.rate_limited = 0
+        self.wait_time = 0.0
+        self.depth = 0
+        self.max_depth = 0
+        self._queues = {}
+        self._pending_edits = {}
+        self._buckets = {}
+        self._workers = {}
+
+    def channel_depths(self):
+        return {channel_id: len(queue) for channel_id, queue in self._queues.items() if queue}
+
+    def send(self, destination, content=None, **kwargs):
+        if content is not None:
+            kwargs['content'] = content
+        channel = getattr(destination, 'channel', destination)
+        return self._enqueue(channel.id, Operation('send', destination, kwargs))
+
+    def edit(self, message, **kwargs):
+        pending = self._pending_edits.get(message.id)
+        if pending is not None:
+            pending.kwargs.update(kwargs)
+            self.coalesced += 1
+            return pending.future
+        operation = Operation('edit', message, kwargs)
+        self._pending_edits[message.id] = operation
+        return self._enqueue(message.channel.id, operation)
+
+    def _enqueue(self, channel_id, operation):
+        queue = self._queues.get(channel_id)
+        if queue is None:
+            queue = self._queues[channel_id] = collections.deque()
+        queue.append(operation)
+        self.depth += 1
+        self.max_depth = max(self.max_depth, self.depth)
+        if channel_id not in self._workers:
+            self._workers[channel_id] = asyncio.ensure_future(self._drain(channel_id))
+        return operation.future
+
+    def _bucket(self, kind, channel_id):
+        key = (kind, channel_id)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = Bucket(self.limit, self.period)
+        return bucket
+
+    async def _drain(self, channel_id):
+        queue = self._queues[channel_id]
+        try:
+            while queue:
+                operation = queue[0]
+                bucket = self._bucket(operation.kind, channel_id)
+                delay = bucket.delay()
+                if delay > 0:
+                    # Edits that arrive while we wait are merged into the queued ones.
+                    self.wait_time += delay
+                    await asyncio.sleep(delay)
+                    continue
+
+                if operation.kind == 'edit':
+                    self._pending_edits.pop(operation.target.id, None)
+                queue.popleft()
+                self.depth -= 1
+                bucket.take()
+                try:
+                    result = await self._perform(operation)
+                except discord.RateLimited as e:
+                    self.rate_limited += 1
+                    bucket.block(e.retry_after)
+                    self._requeue(queue, operation)
+                    continue
+                except Exception as e:
+                    if not operation.future.done():
+                        operation.future.set_exception(e)
+                    continue
+                if not operation.future.done():
+                    operation.future.set_result(result)
+        finally:
+            del self._workers[channel_id]
+            if not queue:
+                del self._queues[channel_id]
+
+    def _requeue(self, queue, operation):
+        self.depth += 1
+        if operation.kind == 'edit':
+            pending = self._pending_edits.get(operation.target.id)
+            if pending is not None:
+                # A newer edit arrived while this one was refused; send them as one.
+                operation.kwargs.update(pending.kwargs)
+                queue.remove(pending)
+                self.depth -= 1
+                operation.future.add_done_callback(lambda f: _chain(f, pending.future))
+            self._pending_edits[operation.target.id] = operation
+        queue.appendleft(operation)
+
+    async def _perform(self, operation):
+        if operation.kind == 'send':
+            self.sent += 1
+            return await operation.target.send(**operation.kwargs)
+        self.edited += 1
+        return await operation.target.edit(**operation.kwargs)
+
+
+def log_failure(future):
+    # Done callback for a send or edit nobody awaits, e.g. one animation frame of many,
+    # so its error is reported instead of lost with the future.
+    if not future.cancelled() and future.exception() is not None:
+        log.error('Outbox operation failed', exc_info=future.exception())
+
+
+def _chain(source, target):
+    if target.done():
+        return
+    if source.cancelled():
+        target.cancel()
+    elif source.exception() is not None:
+        target.set_exception(source.exception())
+    else:
+        target.set_result(source.result())
@@ -0,0 +1,66 @@
+import math
+import random
+
+# Pure payout rules shared by the bot and the offline RTP audit. Everything is plain
+# arithmetic and comparisons so the same functions work on ints or on NumPy arrays.
+# Payouts are the total returned to the player, stake included: 0 is a loss.
+
+DICE_ROLL_MIN = 0.01
+DICE_ROLL_MAX = 99.99
+DICE_OVER_RANGE = (5.99, 99.98)
+DICE_UNDER_RANGE = (0.01, 94)
+
+COIN_FACES = ('🌝', '🌚')
+RPS_CHOICES = ('🪨', '📄', '✂️')
+RPS_TIE, RPS_WIN, RPS_LOSE = 0, 1, 2
+# The smallest stake for dice and autobet, where rounding payouts down still leaves
+# most of the multiplier; audit.py checks the returns at this stake by default.
+MIN_BET = 10
+
+
+def dice_roll(rng=random):
+    return round(rng.uniform(DICE_ROLL_MIN, DICE_ROLL_MAX), 2)
+
+
+def coin_flip(rng=random):
+    return rng.randrange(len(COIN_FACES))
+
+
+def rps_pick(rng=random):
+    return rng.randrange(len(RPS_CHOICES))
+
+
+def dice_multiplier(choice, number):
+    # None when the target is outside the range allowed for that side.
+    low, high = DICE_OVER_RANGE if choice == 'over' else DICE_UNDER_RANGE
+    if not low <= number <= high:
+        return None
+    if choice == 'over':
+        return 100 / (100 - number)
+    return 100 / number
+
+
+def dice_won(choice, number, roll):
+    if choice == 'over':
+        return roll > number
+    return roll < number
+
+
+def dice_payout(bet_amount, multiplier, won):
+    # Rounded down, or small bets round up to more than the odds pay. Targets have two
+    # decimals, so a payout that is not whole is at least 1/10000 off one; rounding to six
+    # places first only drops float error like 99.99999999999999.
+    return won * math.floor(round(bet_amount * multiplier, 6))
+
+
+def coinflip_payout(bet_amount, won):
+    return won * bet_amount * 2
+
+
+def rps_outcome(user_choice, bot_choice):
+    # Choices are indexes into RPS_CHOICES; each one beats the choice before it.
+    return (user_choice - bot_choice) % 3
+
+
+def rps_payout(bet_amount, outcome):
+    return (outcome == RPS_WIN) * bet_amount * 2 + (outcome == RPS_TIE) * bet_amount
@@ -0,0 +1,76 @@
+import collections
+import os
+import sys
+import threading
+import time
+
+SAMPLE_INTERVAL = 0.005
+MAX_DEPTH = 64
+
+
+class SamplingProfiler:
+    # Samples one thread's Python stack from a background thread every few milliseconds
+    # and counts identical stacks. Costs nothing while stopped, so it can stay wired in
+    # and be switched on when the bot is slow. folded() is the collapsed-stack format
+    # that flamegraph.pl and speedscope read.
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self.samples = 0
+        self.started_at = None
+        self._stacks = collections.Counter()
+        self._target = None
+        self._thread = None
+        self._stop = threading.Event()
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def start(self, thread_id=None):
+        if self._thread is not None:
+            return False
+        self._target = thread_id if thread_id is not None else threading.get_ident()
+        self._stacks = collections.Counter()
+        self.samples = 0
+        self.started_at = time.monotonic()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='profiler', daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self):
+        if self._thread is None:
+            return False
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        return True
+
+    def folded(self):
+        return '\n'.join(f'{stack} {count}' for stack, count in self._stacks.most_common()) + '\n'
+
+    def top(self, count=10):
+        # Functions by share of samples they were running in (leaf) or anywhere on the stack.
+        leaves = collections.Counter()
+        inclusive = collections.Counter()
+        for stack, samples in self._stacks.items():
+            frames = stack.split(';')
+            leaves[frames[-1]] += samples
+            for frame in set(frames):
+                inclusive[frame] += samples
+        return leaves.most_common(count), inclusive.most_common(count)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            if frame is None:
+                break
+            stack = []
+            while frame is not None and len(stack) < MAX_DEPTH:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+                frame = frame.f_back
+            stack.reverse()
+            self._stacks[';'.join(stack)] += 1
+            self.samples += 1
@@ -0,0 +1,43 @@
+import asyncio
+
+from bank import Bank
+from cooldowns import DEFAULT_TIMEZONE
+
+
+def run_bank(path, test):
+    async def main():
+        bank = Bank(str(path), DEFAULT_TIMEZONE)
+        await bank.start()
+        try:
+            await test(bank)
+        finally:
+            await bank.close()
+    asyncio.run(main())
+
+
+def test_rotate_refused_while_a_game_is_open(tmp_path):
+    async def test(bank):
+        await bank.ledger.execute('INSERT INTO user_balance (user_id, balance) VALUES (?, ?)', (1, 1000))
+        reservation = await bank.reserve(1, 100, 'minesweeper')
+        await bank.fair_draw(1, 'minesweeper', [3], reservation)
+        seed = await bank.fair_seed(1)
+
+        assert await bank.rotate_seed(1) is None
+        assert await bank.fair_seed(1) == seed
+
+        await bank.settle(reservation, 0)
+        old, new = await bank.rotate_seed(1)
+        assert old[1] == seed[0]
+        assert new[0] != seed[0]
+
+    run_bank(tmp_path / 'casino.db', test)
+
+
+def test_rotate_allowed_with_another_users_game_open(tmp_path):
+    async def test(bank):
+        await bank.ledger.execute('INSERT INTO user_balance (user_id, balance) VALUES (?, ?)', (2, 1000))
+        await bank.reserve(2, 100, 'rps')
+
+        assert await bank.rotate_seed(1) is not None
+
+    run_bank(tmp_path / 'casino.db', test)
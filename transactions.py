@@ -0,0 +1,134 @@
+import time
+
+DAY = 24 * 60 * 60
+COMPACT_BATCH = 20000
+
+
+class Transaction:
+    __slots__ = ('user_id', 'game', 'stake', 'payout', 'created_at', 'game_id')
+
+    def __init__(self, user_id, game, stake, payout, created_at, game_id):
+        self.user_id = user_id
+        self.game = game
+        self.stake = stake
+        self.payout = payout
+        self.created_at = created_at
+        self.game_id = game_id
+
+    @property
+    def net(self):
+        return self.payout - self.stake
+
+
+class TransactionLog:
+    # Append-only record of every settled bet and claim. Rows are buffered in memory and
+    # written as one executemany in the same flush as the balances they explain, so the
+    # history and the balances can never disagree and a bet costs no extra round trip.
+    # Rows older than the retention window are folded into per-day, per-user, per-game
+    # totals by compact().
+
+    def __init__(self, accounts):
+        self.accounts = accounts
+        self.recorded = 0
+        self._buffer = []
+        self._observers = []
+        accounts.add_flusher(self._collect)
+
+    @property
+    def buffered(self):
+        return len(self._buffer)
+
+    def add_observer(self, observer):
+        # observer(user_id, game, stake, payout) is called for every recorded transaction.
+        self._observers.append(observer)
+
+    def record(self, user_id, game, stake, payout, game_id=None):
+        self._buffer.append((user_id, game, stake, payout, int(time.time()), game_id))
+        self.recorded += 1
+        for observer in self._observers:
+            observer(user_id, game, stake, payout)
+
+    async def history(self, user_id, limit):
+        await self.accounts.flush()
+        rows = await self.accounts.ledger.read(_history, user_id, limit)
+        return [Transaction(user_id, *row) for row in rows]
+
+    async def game_totals(self, game, start, end):
+        # (rounds, stake, payout) for one game over [start, end), counting both raw rows
+        # and compacted days. Compacted days are only counted when wholly inside the range.
+        await self.accounts.flush()
+        return await self.accounts.ledger.read(_game_totals, game, start, end)
+
+    async def compact(self, before, batch=COMPACT_BATCH):
+        # Done in batches so other ledger work is not stuck behind one huge transaction.
+        await self.accounts.flush()
+        compacted = 0
+        while True:
+            count = await self.accounts.ledger.run(_compact, before, batch)
+            compacted += count
+            if count < batch:
+                return compacted
+
+    def _collect(self):
+        rows = self._buffer
+        self._buffer = []
+
+        def restore():
+            self._buffer[:0] = rows
+
+        statements = [
+            ('INSERT INTO transactions (user_id, game, stake, payout, created_at, game_id) VALUES (?, ?, ?, ?, ?, ?)', rows),
+        ]
+        return statements, restore
+
+
+def _history(conn, user_id, limit):
+    return conn.execute('''
+        SELECT game, stake, payout, created_at, game_id FROM transactions
+        WHERE user_id = ? ORDER BY id DESC LIMIT ?
+    ''', (user_id, limit)).fetchall()
+
+
+def _game_totals(conn, game, start, end):
+    raw = conn.execute('''
+        SELECT COUNT(*), COALESCE(SUM(stake), 0), COALESCE(SUM(payout), 0) FROM transactions
+        WHERE game = ? AND created_at >= ? AND created_at < ?
+    ''', (game, start, end)).fetchone()
+    days = conn.execute('''
+        SELECT COALESCE(SUM(rounds), 0), COALESCE(SUM(stake), 0), COALESCE(SUM(payout), 0) FROM transaction_days
+        WHERE game = ? AND day >= ? AND day <= ?
+    ''', (game, start, end - DAY)).fetchone()
+    return tuple(a + b for a, b in zip(raw, days))
+
+
+def _compact(conn, before, batch):
+    row = conn.execute('''
+        SELECT MAX(id) FROM (SELECT id FROM transactions WHERE created_at < ? ORDER BY id LIMIT ?)
+    ''', (before, batch)).fetchone()
+    last_id = row[0]
+    if last_id is None:
+        return 0
+    conn.execute(f'''
+        INSERT INTO transaction_days (game, day, user_id, rounds, stake, payout)
+        SELECT game, created_at - created_at % {DAY}, user_id, COUNT(*), SUM(stake), SUM(payout)
+        FROM transactions WHERE id <= ? AND created_at < ?
+        GROUP BY game, created_at - created_at % {DAY}, user_id
+        ON CONFLICT (game, day, user_id) DO UPDATE SET
+            rounds = rounds + excluded.rounds,
+            stake = stake + excluded.stake,
+            payout = payout + excluded.payout
+    ''', (last_id, before))
+    # .verify reads a game's rounds by game id; games with a fairness record keep their
+    # totals there once the rows are gone.
+    conn.execute('''
+        UPDATE fair_bets SET
+            compacted_rounds = compacted_rounds + totals.rounds,
+            compacted_stake = compacted_stake + totals.stake,
+            compacted_payout = compacted_payout + totals.payout
+        FROM (
+            SELECT game_id, COUNT(*) AS rounds, SUM(stake) AS stake, SUM(payout) AS payout FROM transactions
+            WHERE id <= ? AND created_at < ? AND game_id IS NOT NULL GROUP BY game_id
+        ) AS totals
+        WHERE fair_bets.game_id = totals.game_id
+    ''', (last_id, before))
+    return conn.execute('DELETE FROM transactions WHERE id <= ? AND created_at < ?', (last_id, before)).rowcount
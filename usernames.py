@@ -0,0 +1,58 @@
+import collections
+import time
+
+import discord
+
+MAX_NAMES = 2000
+NAME_TTL = 60 * 60
+
+
+class UserNameCache:
+    # Resolves user ids to display names without a REST call in the common case: the
+    # gateway cache is consulted first and fetch_user results are kept in a bounded LRU
+    # with a TTL so renamed users are eventually picked up. With member caching off the
+    # gateway cache is nearly empty, so authors of messages the bot sees are remembered
+    # here too; players show up on the leaderboard without a fetch.
+
+    def __init__(self, bot, max_names=MAX_NAMES, ttl=NAME_TTL):
+        self.bot = bot
+        self.max_names = max_names
+        self.ttl = ttl
+        self.fetches = 0
+        self._names = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self._names)
+
+    def remember(self, user):
+        self._names[user.id] = (user.name, time.monotonic() + self.ttl)
+        self._names.move_to_end(user.id)
+        if len(self._names) > self.max_names:
+            self._names.popitem(last=False)
+
+    async def resolve(self, user_id):
+        user = self.bot.get_user(user_id)
+        if user is not None:
+            return user.name
+
+        cached = self._names.get(user_id)
+        if cached is not None:
+            name, expires = cached
+            if expires > time.monotonic():
+                self._names.move_to_end(user_id)
+                return name
+            del self._names[user_id]
+
+        self.fetches += 1
+        try:
+            user = await self.bot.fetch_user(user_id)
+            name = user.name
+        except discord.NotFound:
+            name = f'User ID {user_id}'
+        except discord.HTTPException:
+            return f'User ID {user_id}'
+
+        self._names[user_id] = (name, time.monotonic() + self.ttl)
+        if len(self._names) > self.max_names:
+            self._names.popitem(last=False)
+        return name
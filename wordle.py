@@ -0,0 +1,108 @@
+import collections
+import time
+
+import wordle_words
+
+MAX_TRIES = 6
+WORD_LENGTH = 5
+SESSION_TTL = 30 * 60
+MAX_SESSIONS = 50000
+
+GREY, YELLOW, GREEN = 0, 1, 2
+SQUARES = (":black_large_square:", ":yellow_square:", ":green_square:")
+
+
+def score(answer, guess):
+    # Packs the five colours into one base-3 int. Greens are matched first so that a
+    # repeated letter never shows yellow while its green is still to come.
+    colours = [GREY] * WORD_LENGTH
+    unmatched = []
+    for i in range(WORD_LENGTH):
+        if guess[i] == answer[i]:
+            colours[i] = GREEN
+        else:
+            unmatched.append(answer[i])
+    for i in range(WORD_LENGTH):
+        if colours[i] == GREY and guess[i] in unmatched:
+            colours[i] = YELLOW
+            unmatched.remove(guess[i])
+
+    packed = 0
+    for colour in reversed(colours):
+        packed = packed * 3 + colour
+    return packed
+
+
+def render_score(packed):
+    squares = []
+    for _ in range(WORD_LENGTH):
+        packed, colour = divmod(packed, 3)
+        squares.append(SQUARES[colour])
+    return " ".join(squares)
+
+
+class WordleSession:
+    __slots__ = ('answer_index', 'guesses', 'last_used')
+
+    def __init__(self, answer_index):
+        self.answer_index = answer_index
+        self.guesses = bytearray()
+        self.last_used = time.monotonic()
+
+    @property
+    def answer(self):
+        return wordle_words.ANSWERS[self.answer_index]
+
+    @property
+    def tries_left(self):
+        return MAX_TRIES - len(self.guesses) // WORD_LENGTH
+
+    def play(self, guess):
+        self.guesses += bytes(ord(letter) - 65 for letter in guess)
+        return guess == self.answer
+
+    def results(self):
+        answer = self.answer
+        for start in range(0, len(self.guesses), WORD_LENGTH):
+            guess = ''.join(chr(code + 65) for code in self.guesses[start:start + WORD_LENGTH])
+            yield guess, score(answer, guess)
+
+
+class WordleSessions:
+    # One game per (guild, channel, user). Sessions are kept in least recently used order
+    # so both the idle TTL sweep and the size cap only ever look at the oldest entries.
+
+    def __init__(self, ttl=SESSION_TTL, max_sessions=MAX_SESSIONS, pick_answer=wordle_words.random_answer_index):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.pick_answer = pick_answer
+        self._sessions = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def get(self, key):
+        session = self._sessions.get(key)
+        if session is None:
+            session = WordleSession(self.pick_answer())
+            self._sessions[key] = session
+            if len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        else:
+            self._sessions.move_to_end(key)
+        session.last_used = time.monotonic()
+        return session
+
+    def end(self, key):
+        self._sessions.pop(key, None)
+
+    def evict_expired(self):
+        cutoff = time.monotonic() - self.ttl
+        evicted = 0
+        while self._sessions:
+            key, session = next(iter(self._sessions.items()))
+            if session.last_used > cutoff:
+                break
+            del self._sessions[key]
+            evicted += 1
+        return evicted
@@ -0,0 +1,28 @@
+import hashlib
+import os
+import random
+
+WORDS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'words')
+
+
+def _load_words(filename):
+    with open(os.path.join(WORDS_DIR, filename), encoding='utf-8') as f:
+        return tuple(line.strip().upper() for line in f if line.strip())
+
+
+# Answers are a curated list of common words; any answer is also a valid guess.
+ANSWERS = _load_words('answers.txt')
+VALID_GUESSES = frozenset(_load_words('allowed.txt')).union(ANSWERS)
+
+
+def is_valid_word(word):
+    return word.upper() in VALID_GUESSES
+
+
+def random_answer_index(rng=random):
+    return rng.randrange(len(ANSWERS))
+
+
+def daily_answer_index(day):
+    digest = hashlib.sha256(day.isoformat().encode()).digest()
+    return int.from_bytes(digest[:8], 'big') % len(ANSWERS)